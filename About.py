@@ -3,14 +3,11 @@ import pandas as pd
 import plotly.express as px
 from PIL import Image
 import os
-from difflib import get_close_matches
+from data_loader import load_commodity_summary, load_food, load_image_index
+from figure_cache import cached_figure
 
 def show_about():
-    @st.cache_data
-    def load_data():
-        return pd.read_excel("cleaned_hdx_hapi_food_price_lka.xlsx")
-
-    Food = load_data()
+    Food = load_food()
 
     st.title("Inside Sri Lanka’s Food Price Pulse")
     st.markdown("""
@@ -43,39 +40,47 @@ def show_about():
     with col2:
         selected_commodity = st.selectbox("Select a Commodity", sorted(Food["Commodity_Name"].dropna().unique()))
 
+    # Region, commodity and unit are looked up in the precomputed summary
+    summary = load_commodity_summary()
+
     with col3:
-        selected_unit = st.selectbox("Select a Unit", sorted(Food["Unit"].dropna().unique()))
+        selected_unit = st.selectbox("Select a Unit", summary.units(selected_commodity))
 
-    # Filter data
-    filtered_df = Food[(Food["Admin1_Name"] == selected_region) & (Food["Commodity_Name"] == selected_commodity)]
+    # Rows of the selected series, already in date order
+    filtered_df = summary.rows_of('series', selected_region, selected_commodity, selected_unit)
 
     if not filtered_df.empty:
-        fig = px.line(
-            filtered_df.sort_values("Reference_Period_Start"),
-            x="Reference_Period_Start",
-            y="Price",
-            title=f"Price Trend for {selected_commodity} in {selected_region}",
-            labels={"Price": "Price (LKR)", "Reference_Period_Start": "Date"},
-            markers=True,
-            template="plotly_white"
-        )
+        def build_about_start_trend():
+            fig = px.line(
+                filtered_df,
+                x="Reference_Period_Start",
+                y="Price",
+                title=f"Price Trend for {selected_commodity} ({selected_unit}) in {selected_region}",
+                labels={"Price": "Price (LKR)", "Reference_Period_Start": "Date"},
+                markers=True,
+                template="plotly_white"
+            )
+            return fig
+
+        fig = cached_figure('about_start_trend', {'region': selected_region, 'commodity': selected_commodity, 'unit': selected_unit}, build_about_start_trend)
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No data available for the selected filters.")
 
-      # Filter data
-    filtered_df = Food[(Food["Admin1_Name"] == selected_region) & (Food["Commodity_Name"] == selected_commodity)]
-
     if not filtered_df.empty:
-        fig = px.line(
-            filtered_df.sort_values("Reference_Period_End"),
-            x="Reference_Period_End",
-            y="Price",
-            title=f"Price Trend for {selected_commodity} in {selected_region}",
-            labels={"Price": "Price (LKR)", "Reference_Period_End": "Date"},
-            markers=True,
-            template="plotly_white"
-        )
+        def build_about_end_trend():
+            fig = px.line(
+                filtered_df.sort_values("Reference_Period_End"),
+                x="Reference_Period_End",
+                y="Price",
+                title=f"Price Trend for {selected_commodity} ({selected_unit}) in {selected_region}",
+                labels={"Price": "Price (LKR)", "Reference_Period_End": "Date"},
+                markers=True,
+                template="plotly_white"
+            )
+            return fig
+
+        fig = cached_figure('about_end_trend', {'region': selected_region, 'commodity': selected_commodity, 'unit': selected_unit}, build_about_end_trend)
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No data available for the selected filters.")
@@ -86,51 +91,26 @@ def show_about():
     st.title("Commodity Details")
     st.subheader(f"Detailed Information for: {selected_commodity}")
     
-    # Image Matching
-    image_folder = "Commodities"
-    valid_extensions = [".jpg", ".jpeg", ".png"]
-    
-    try:
-        available_images = [f for f in os.listdir(image_folder) 
-                          if os.path.splitext(f)[1].lower() in valid_extensions]
-    except FileNotFoundError:
-        st.error(f"Image folder '{image_folder}' not found!")
-        available_images = []
-
-    def find_image(commodity_name):
-        for ext in valid_extensions:
-            exact_name = f"{commodity_name}{ext}"
-            if exact_name in available_images:
-                return os.path.join(image_folder, exact_name)
-
-        base = commodity_name.lower().replace(" ", "").replace("(", "").replace(")", "")
-        candidates = {
-            img: img.lower().replace(" ", "").replace("_", "").replace("-", "").replace("(", "").replace(")", "") 
-            for img in available_images
-        }
-        match = get_close_matches(base, candidates.values(), n=1, cutoff=0.6)
-        if match:
-            for original_name, cleaned in candidates.items():
-                if cleaned == match[0]:
-                    return os.path.join(image_folder, original_name)
-        return None
-
-    image_path = find_image(selected_commodity)
+    # Image matching is done once per process by the image index
+    images = load_image_index()
+    if not images.available:
+        st.error(f"Image folder '{images.folder}' not found!")
+    image_path = images.main.get(selected_commodity)
 
     col_img, col_info = st.columns([1, 2])
     
     with col_img:
         if image_path and os.path.exists(image_path):
-            st.image(image_path, caption=selected_commodity, use_column_width=True)
+            st.image(images.thumbnail(image_path), caption=selected_commodity, use_column_width=True)
         else:
             st.warning("Image not available for this commodity.")
 
     #Description Table
     with col_info:
-        commodity_data = Food[Food["Commodity_Name"] == selected_commodity]
+        stats = summary.stats('commodity_unit', selected_commodity, selected_unit)
         
-        if not commodity_data.empty:
-            latest_entry = commodity_data.sort_values("Reference_Period_Start", ascending=False).iloc[0]
+        if stats is not None:
+            latest_entry = summary.latest('commodity_unit', selected_commodity, selected_unit)
             
             st.markdown("Market Information")
             st.markdown(f"""
@@ -142,9 +122,9 @@ def show_about():
             """)
             
             # Price statistics
-            avg_price = round(commodity_data['Price'].mean(), 2)
-            min_price = commodity_data['Price'].min()
-            max_price = commodity_data['Price'].max()
+            avg_price = round(stats['mean'], 2)
+            min_price = stats['min']
+            max_price = stats['max']
             
             st.markdown("Price Statistics")
             st.markdown(f"""
@@ -157,16 +137,13 @@ def show_about():
 
     # Additional images section
     st.markdown("Additional Images")
-    matching_images = [
-        os.path.join(image_folder, img) for img in available_images
-        if selected_commodity.lower().replace(" ", "") in img.lower().replace(" ", "")
-    ]
+    matching_images = images.additional.get(selected_commodity, [])
     
     if matching_images:
         cols = st.columns(min(3, len(matching_images)))
         for idx, img_path in enumerate(matching_images):
             with cols[idx % len(cols)]:
-                st.image(img_path, use_column_width=True)
+                st.image(images.thumbnail(img_path), use_column_width=True)
     else:
         st.info("No additional images available for this commodity.")
 
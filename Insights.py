@@ -1,9 +1,15 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from datetime import datetime
+from data_loader import DAILY_WAGE, load_food, load_filter_index, load_price_changes, load_risk, load_snapshots, load_volatility
+from price_changes import WINDOWS
+from risk import FOOD_SHARE
+from volatility import ROLLING_WINDOW
+from downsample import sample_points
+from figure_cache import cached_figure
+
+def show_Insights():
+    Food = load_food()
 
-def show_Insights(Food):
     st.title("Quick Insights For Policy Makers")
     st.markdown("Data Driven Quick Insights for Policy Makers")
     
@@ -11,14 +17,12 @@ def show_Insights(Food):
     st.sidebar.header("Filters For Top Trends In Tab 2")
     selected_commodities = st.sidebar.multiselect(
         "Select Commodities",
-        options=Food['Commodity_Name'].unique(),
-        default=Food['Commodity_Name'].unique()
+        options=Food['Commodity_Name'].unique().tolist(),
+        default=Food['Commodity_Name'].unique().tolist()
     )
     
     # Applying filters
-    filtered_data = Food[
-        (Food['Commodity_Name'].isin(selected_commodities)) 
-    ]
+    filtered_data = load_filter_index().select(Commodity_Name=selected_commodities)
     
     # Creating and adding 6 tabs for policy makers to make quick decisions
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
@@ -31,17 +35,25 @@ def show_Insights(Food):
     ])
     
     with tab1:
-        st.header("Critical Price Changes (Last 6 Months)")
-        recent = filtered_data[filtered_data['Reference_Period_Start'] >= datetime.now() - pd.DateOffset(months=6)]
-        if not recent.empty:
-            changes = recent.groupby('Commodity_Name')['Price'].agg(['first','last'])
-            changes['change'] = ((changes['last'] - changes['first'])/changes['first'])*100
-            top5 = changes.nlargest(5, 'change').reset_index()
-            
-            fig = px.bar(top5, y='Commodity_Name', x='change', 
-                        color='change', color_continuous_scale='reds',
-                        title="Biggest Price Increases (%)",
-                        labels={'change': 'Price Increase %'})
+        window = st.select_slider("Lookback (months)", options=WINDOWS, value=6)
+        # Changes are per commodity, market, unit and price type, taken from
+        # the monthly series cached at startup and ending at its latest month
+        price_changes = load_price_changes()
+        latest = price_changes.latest_date
+        st.header(f"Critical Price Changes (Last {window} Months to {latest:%B %Y})" if latest is not None
+                  else f"Critical Price Changes (Last {window} Months)")
+        top5 = price_changes.top_increases(window, commodities=selected_commodities)
+        if not top5.empty:
+            def build_price_alerts():
+                alerts = top5.assign(Series=top5['Commodity_Name'].astype(str) + ' - ' + top5['Market_Name'].astype(str))
+                fig = px.bar(alerts, y='Series', x='change', 
+                            color='change', color_continuous_scale='reds',
+                            title="Biggest Price Increases (%)",
+                            hover_data={'Unit': True, 'Price_Type': True, 'base_price': ':.2f', 'last_price': ':.2f'},
+                            labels={'change': 'Price Increase %', 'Series': 'Commodity - Market'})
+                return fig
+
+            fig = cached_figure('price_alerts', {'commodities': set(selected_commodities), 'window': window, 'as_of': None if latest is None else latest.strftime('%Y-%m')}, build_price_alerts)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No data available for the selected filters and time period")
@@ -49,28 +61,32 @@ def show_Insights(Food):
     with tab2:
         st.header("Price Trends")
         # yearly averages
-        yearly_avg = filtered_data.groupby(
-            [filtered_data['Reference_Period_Start'].dt.year, 'Commodity_Name']
-        )['Price'].mean().reset_index()
+        def build_yearly_trends():
+            yearly_avg = filtered_data.groupby(['Year', 'Commodity_Name'], observed=True)['Price'].mean().reset_index()
         
-        # creating a line chart
-        fig = px.line(yearly_avg, 
-                     x='Reference_Period_Start', 
-                     y='Price', 
-                     color='Commodity_Name',
-                     title="Yearly Price Changes")
+            # creating a line chart
+            fig = px.line(yearly_avg, 
+                         x='Year', 
+                         y='Price', 
+                         color='Commodity_Name',
+                         title="Yearly Price Changes")
+            return fig
+
+        fig = cached_figure('yearly_trends', {'commodities': set(selected_commodities)}, build_yearly_trends)
         st.plotly_chart(fig)
     
     with tab3:
         st.header("Essential Food Affordability")
         if not filtered_data.empty:
-            # Calculate days of wages needed (assuming 500 LKR daily wage)
-            filtered_data['days_wage'] = (filtered_data['Price'] / 500) * 30
-            
-            fig = px.box(filtered_data, x='Commodity_Name', y='days_wage',
-                        color='Commodity_Name',
-                        title="Days of Wages Needed to Buy Essentials",
-                        labels={'days_wage': 'Days of wages needed', 'Commodity_Name': 'Commodity'})
+            # days_wage is precomputed at load time (assuming 500 LKR daily wage)
+            def build_affordability_box():
+                fig = px.box(sample_points(filtered_data, 'days_wage', by='Commodity_Name'), x='Commodity_Name', y='days_wage',
+                            color='Commodity_Name',
+                            title="Days of Wages Needed to Buy Essentials",
+                            labels={'days_wage': 'Days of wages needed', 'Commodity_Name': 'Commodity'})
+                return fig
+
+            fig = cached_figure('affordability_box', {'commodities': set(selected_commodities)}, build_affordability_box)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No data available for the selected filters")
@@ -78,29 +94,55 @@ def show_Insights(Food):
     with tab4:
         st.header("Market Volatility Index")
         if not filtered_data.empty:
-            volatility = filtered_data.groupby('Commodity_Name')['Price'].std().nlargest(10).reset_index()
-            
-            fig = px.bar(volatility, x='Price', y='Commodity_Name',
-                        color='Price', orientation='h',
-                        color_continuous_scale='thermal',
-                        title="Most Volatile Commodities",
-                        labels={'Price': 'Price Standard Deviation'})
+            volatility = load_volatility().summary('Commodity_Name', 'Price', Commodity_Name=selected_commodities)
+            volatility = volatility['std'].nlargest(10).rename('Price').reset_index()
+
+            def build_volatility_bar():
+                fig = px.bar(volatility, x='Price', y='Commodity_Name',
+                            color='Price', orientation='h',
+                            color_continuous_scale='thermal',
+                            title="Most Volatile Commodities",
+                            labels={'Price': 'Price Standard Deviation'})
+                return fig
+
+            fig = cached_figure('volatility_bar', {'commodities': set(selected_commodities)}, build_volatility_bar)
+            st.plotly_chart(fig, use_container_width=True)
+
+            # Rolling volatility of the five most volatile, median over their markets
+            def build_rolling_volatility():
+                rolling = load_volatility().rolling('Price', ROLLING_WINDOW)
+                top = rolling[rolling['Commodity_Name'].isin(volatility['Commodity_Name'].head(5))]
+                trend = top.groupby(['Month', 'Commodity_Name'])['cv'].median().reset_index()
+                fig = px.line(trend, x='Month', y='cv', color='Commodity_Name',
+                             title=f"Rolling {ROLLING_WINDOW}-Month Coefficient of Variation",
+                             labels={'cv': 'Coefficient of variation', 'Commodity_Name': 'Commodity'})
+                return fig
+
+            fig = cached_figure('rolling_volatility', {'commodities': set(selected_commodities)}, build_rolling_volatility)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No data available for the selected filters")
     
     with tab5:
         st.header("Staple Food Prices")
-        staples = filtered_data[filtered_data['Commodity_Category'].isin(['Cereals and Tubers', 'Oil and Fats'])]
-        if not staples.empty:
-            latest = staples.sort_values('Reference_Period_Start').groupby('Commodity_Name').last()
-            
-            fig = px.treemap(latest.reset_index(),
-                            path=['Commodity_Name'],
-                            values='Price',
-                            color='Price',
-                            title="Current Staple Food Prices",
-                            hover_data=['Price'])
+        # Newest observation of each staple, one whole row per commodity from the snapshot engine
+        latest = load_snapshots().latest(
+            'Commodity_Name',
+            Commodity_Category=['Cereals and Tubers', 'Oil and Fats'],
+            Commodity_Name=selected_commodities
+        )
+        if not latest.empty:
+            def build_staple_treemap():
+                # treemap paths are grouped without observed=True, so pass plain strings
+                fig = px.treemap(latest.astype({'Commodity_Name': str}),
+                                path=['Commodity_Name'],
+                                values='Price',
+                                color='Price',
+                                title="Current Staple Food Prices",
+                                hover_data={'Price': ':.2f'})
+                return fig
+
+            fig = cached_figure('staple_treemap', {'commodities': set(selected_commodities)}, build_staple_treemap)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("No staple food data available for the selected filters")
@@ -109,22 +151,12 @@ def show_Insights(Food):
         st.header("Food Insecurity and Starvation Risk")
         st.subheader("Based on food prices vs. local income (UN/WB standards)")
         
-        # Constants (adjust these for your country)
-        DAILY_INCOME = 500  # Average daily wage in LKR
-        FOOD_SPENDING_LIMIT = 0.3  # UN's 30% threshold
-        
-        def calculate_risk(data, region_type):
-            # 1. Get average prices per region
-            avg_prices = data.groupby([region_type, 'Commodity_Name'])['Price'].mean()
-            
-            # 2. Calculate risk: (monthly food cost) / (30% of monthly income)
-            monthly_income = DAILY_INCOME * 30
-            risk = (avg_prices / monthly_income) / FOOD_SPENDING_LIMIT
-            
-            # 3. Get top 5 riskiest regions
-            top_risks = risk.groupby(region_type).mean().nlargest(5).clip(0, 1)
-            
-            return top_risks.to_frame('Risk %')
+        # Defaults follow the average daily wage and the UN's 30% threshold,
+        # changing them only rescales the precomputed regional averages
+        wage_col, share_col = st.columns(2)
+        daily_income = wage_col.number_input("Daily wage (LKR)", min_value=1, value=DAILY_WAGE, step=50)
+        food_share = share_col.slider("Food share of income", min_value=0.05, max_value=1.0, value=FOOD_SHARE, step=0.05)
+        risk_engine = load_risk()
         
         # Display in 3 columns
         cols = st.columns(3)
@@ -137,7 +169,7 @@ def show_Insights(Food):
         for i, (region_col, title, color) in enumerate(regions):
             with cols[i]:
                 st.markdown(f"**{title}**")
-                risk_df = calculate_risk(filtered_data, region_col)
+                risk_df = risk_engine.top(region_col, daily_income, food_share, commodities=selected_commodities)
                 st.dataframe(
                     risk_df.style.format("{:.0%}").background_gradient(color),
                     height=200
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+FRAME_DURATION = 500  # ms per frame when playing
+
+
+# Rows of one animated chart grouped by frame once at load time. Every column
+# is kept as a single array sorted by frame, numbers rounded to `decimals`
+# (2 unless given per column) so the serialized frames stay small, and a frame
+# is a slice between two precomputed bounds.
+class FrameStore:
+    def __init__(self, df, frame, columns, decimals=None):
+        decimals = decimals or {}
+        df = df[df[frame].notna()]
+        codes, labels = pd.factorize(df[frame].astype(str), sort=True)
+        order = np.argsort(codes, kind='stable')
+        self.frame = frame
+        self.labels = labels.tolist()
+        self.bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+        self.columns = {}
+        for col in columns:
+            values = df[col].to_numpy()[order]
+            if pd.api.types.is_numeric_dtype(df[col]):
+                values = np.round(values.astype('float64'), decimals.get(col, 2))
+            else:
+                values = values.astype(str).astype(object)
+            self.columns[col] = values
+
+    def __getitem__(self, col):
+        return self.columns[col]
+
+    # Labels of the frames that keep at least one row under `mask`
+    def present(self, mask=None):
+        if mask is None:
+            return list(self.labels)
+        return [label for i, label in enumerate(self.labels) if mask[self.bounds[i]:self.bounds[i + 1]].any()]
+
+    def frame_data(self, label, mask=None):
+        i = self.labels.index(label)
+        rows = slice(self.bounds[i], self.bounds[i + 1])
+        if mask is None:
+            return {col: values[rows] for col, values in self.columns.items()}
+        keep = mask[rows]
+        return {col: values[rows][keep] for col, values in self.columns.items()}
+
+
+# Animated figure with one frame per label that has rows left after `mask`.
+# `traces(data, label)` returns the plain trace dicts of one frame and must
+# return the same number of traces for every frame. Pass a single label to get
+# a still figure of just that frame. Figures are assembled from dicts without
+# plotly's validation, which is what px spends most of its time on.
+def animated_figure(store, traces, layout=None, mask=None, labels=None, redraw=False):
+    frames = []
+    for label in store.labels if labels is None else labels:
+        data = store.frame_data(label, mask)
+        if len(next(iter(data.values()))):
+            frames.append({'name': label, 'data': traces(data, label)})
+    figure = {'data': frames[0]['data'] if frames else [], 'layout': dict(layout or {})}
+    if len(frames) > 1:
+        figure['frames'] = frames
+        figure['layout']['updatemenus'] = [_play_buttons(redraw)]
+        figure['layout']['sliders'] = [_frame_slider(store.frame, [f['name'] for f in frames], redraw)]
+    return go.Figure(figure, _validate=False)
+
+
+def _animate_args(duration, redraw):
+    return {
+        'frame': {'duration': duration, 'redraw': redraw},
+        'mode': 'immediate',
+        'fromcurrent': True,
+        'transition': {'duration': duration, 'easing': 'linear'},
+    }
+
+
+# Same controls px adds to an animation_frame chart
+def _play_buttons(redraw):
+    return {
+        'buttons': [
+            {'args': [None, _animate_args(FRAME_DURATION, redraw)], 'label': '&#9654;', 'method': 'animate'},
+            {'args': [[None], _animate_args(0, redraw)], 'label': '&#9724;', 'method': 'animate'},
+        ],
+        'direction': 'left', 'pad': {'r': 10, 't': 70}, 'showactive': False, 'type': 'buttons',
+        'x': 0.1, 'xanchor': 'right', 'y': 0, 'yanchor': 'top',
+    }
+
+
+def _frame_slider(frame, labels, redraw):
+    return {
+        'active': 0,
+        'currentvalue': {'prefix': f'{frame}='},
+        'len': 0.9, 'pad': {'b': 10, 't': 60},
+        'steps': [{'args': [[label], _animate_args(0, redraw)], 'label': label, 'method': 'animate'} for label in labels],
+        'x': 0.1, 'xanchor': 'left', 'y': 0, 'yanchor': 'top',
+    }
+
+
+# Marker sizeref px uses for size_max with sizemode 'area'
+def size_ref(sizes, size_max=20):
+    largest = float(np.max(sizes)) if len(sizes) else 0.0
+    return 2.0 * largest / (size_max ** 2) if largest > 0 else 1.0
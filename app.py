@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
@@ -8,6 +9,13 @@ import base64
 import os
 from About import show_about
 from Insights import show_Insights
+from data_loader import load_food, load_rollups, load_rankings, load_animation_frames, load_filter_index, load_correlations, load_price_history, load_snapshots, load_volatility
+from animations import animated_figure, size_ref
+from spatial import aggregate_points, grouping_options
+from rollups import slice_cube, summarize
+from downsample import downsample_series, sample_points
+from figure_cache import cached_figure
+from exports import EXPORT_FORMATS, export_bytes, export_key
 
 # setting the backround image for the dashboard
 def set_background_from_url(url):
@@ -37,12 +45,9 @@ image_url = "https://github.com/DaharaD/DSPL-PREPROCESSING/raw/main/Images/After
 set_background_from_url(image_url)
 
 # Load Data
-@st.cache_data
-def load_data():
-    df = pd.read_excel("cleaned_hdx_hapi_food_price_lka.xlsx")
-    return df
-
-Food = load_data()
+Food = load_food()
+rollups = load_rollups()
+food_index = load_filter_index()
 
 # Sidebar Navigation
 st.sidebar.title("Navigation")
@@ -53,7 +58,7 @@ if view == "About":
     st.stop()
 
 elif view == "Insights":
-    show_Insights(Food) 
+    show_Insights() 
     st.stop()
 
 elif view == "Animations":
@@ -63,6 +68,19 @@ elif view == "Animations":
     These animations reveal temporal patterns, regional variations, and commodity comparisons.
     """)
 
+    # Frames are grouped once per process. Playing ships every frame to the
+    # browser in one figure, stepping builds and sends only the frame on screen.
+    frames = load_animation_frames()
+    step_frames = st.toggle(
+        "Load one frame at a time",
+        help="Faster first paint on slow connections, move between frames with the slider above each chart"
+    )
+
+    def pick_frame(store, label, mask=None):
+        if not step_frames:
+            return None
+        return [st.select_slider(label, options=store.present(mask))]
+
     # Creating 3 tabs for the 3 animations types wch will appear in the animations page
     tab1, tab2, tab3 = st.tabs(["Price Evolution", "Ranking Race", "Regional Waves"])
     
@@ -70,124 +88,158 @@ elif view == "Animations":
         st.subheader("Animated Price Evolution Over Time")
         st.markdown("Watch how prices change across regions and commodities over time.")
         
-        Food['Quarter'] = Food['Reference_Period_Start'].dt.to_period('Q').astype(str)
-        quarterly_avg = Food.groupby(['Quarter', 'Commodity_Name', 'Admin1_Name'])['Price'].mean().reset_index()
+        bubbles = frames['price_bubbles']
+        commodity_names = sorted(set(bubbles['Commodity_Name']))
         
         selected_commodities = st.multiselect(
             "Select commodities to highlight (optional)",
             options=sorted(Food['Commodity_Name'].unique()),
             default=[]
         )
+        bubble_frame = pick_frame(bubbles, "Quarter")
         
-        fig = px.scatter(
-            quarterly_avg,
-            x='Quarter',
-            y='Price',
-            size='Price',
-            color='Commodity_Name',
-            hover_name='Admin1_Name',
-            animation_frame='Quarter',
-            animation_group='Commodity_Name',
-            size_max=45,
-            title='Price Bubbles Over Time',
-            height=600,
-            color_discrete_sequence=px.colors.qualitative.Plotly,
-            category_orders={"Quarter": sorted(quarterly_avg['Quarter'].unique())}
-        )
+        def build_price_bubbles():
+            colors = px.colors.qualitative.Plotly
+            sizeref = size_ref(bubbles['Price'], size_max=45)
+            
+            # One trace per commodity in every frame, so frames line up trace by trace
+            def bubble_traces(data, quarter):
+                traces = []
+                for i, name in enumerate(commodity_names):
+                    rows = data['Commodity_Name'] == name
+                    traces.append({
+                        'type': 'scatter', 'mode': 'markers', 'name': name, 'legendgroup': name,
+                        'x': [quarter] * int(rows.sum()), 'y': data['Price'][rows],
+                        'hovertext': data['Admin1_Name'][rows], 'ids': data['Admin1_Name'][rows],
+                        'marker': {'color': colors[i % len(colors)], 'size': data['Price'][rows],
+                                   'sizemode': 'area', 'sizeref': sizeref, 'symbol': 'circle'},
+                        'hovertemplate': f'<b>%{{hovertext}}</b><br><br>Commodity_Name={name}<br>Quarter=%{{x}}<br>Price=%{{y}}<extra></extra>',
+                    })
+                return traces
+            
+            fig = animated_figure(bubbles, bubble_traces, labels=bubble_frame, layout={
+                'title': {'text': 'Price Bubbles Over Time'},
+                'height': 600,
+                'xaxis': {'title': {'text': 'Quarter'}, 'categoryorder': 'array', 'categoryarray': bubbles.labels},
+                'yaxis': {'title': {'text': 'Price'}},
+                'legend': {'itemsizing': 'constant'},
+            })
     
-        if selected_commodities:
-            fig.update_traces(
-                marker=dict(size=10),
-                selector=lambda t: t.name not in selected_commodities
-            )
-            fig.update_traces(
-                marker=dict(size=20, line=dict(width=2, color='DarkSlateGrey')),
-                selector=lambda t: t.name in selected_commodities
-            )
+            if selected_commodities:
+                fig.update_traces(
+                    marker=dict(size=10),
+                    selector=lambda t: t.name not in selected_commodities
+                )
+                fig.update_traces(
+                    marker=dict(size=20, line=dict(width=2, color='DarkSlateGrey')),
+                    selector=lambda t: t.name in selected_commodities
+                )
         
-        fig.update_layout(
-            xaxis={'categoryorder':'category ascending'},
-            showlegend=True,
-            legend_title_text='Commodities'
-        )
+            fig.update_layout(
+                xaxis={'categoryorder':'category ascending'},
+                showlegend=True,
+                legend_title_text='Commodities'
+            )
+            return fig
+
+        fig = cached_figure('price_bubbles', {'highlight': set(selected_commodities), 'frame': bubble_frame}, build_price_bubbles)
         st.plotly_chart(fig, use_container_width=True)
     
     with tab2:
         st.subheader("Price Ranking Race")
         st.markdown("Track which commodities become most expensive over time.")
         
-        # Prepare monthly rankings
-        monthly_rank = Food.groupby(['Commodity_Name', pd.Grouper(key='Reference_Period_Start', freq='M')])['Price'].mean().reset_index()
-        monthly_rank['Month'] = monthly_rank['Reference_Period_Start'].dt.strftime('%Y-%m')
-    
         top_n = st.slider("Number of top commodities to show", 5, 20, 10)
+        race = frames['ranking_race']
+        # Monthly means are ranked once per process, any top_n is a rank filter
+        in_top_n = race['Rank'] <= top_n
+        race_frame = pick_frame(race, "Month", in_top_n)
         
-        top_n_rank = monthly_rank.groupby('Month').apply(lambda x: x.nlargest(top_n, 'Price')).reset_index(drop=True)
-        
-        fig = px.bar(
-            top_n_rank,
-            x='Price',
-            y='Commodity_Name',
-            color='Commodity_Name',
-            animation_frame='Month',
-            orientation='h',
-            title=f'Top {top_n} Most Expensive Commodities Each Month',
-            range_x=[0, top_n_rank['Price'].max()*1.1],
-            height=600
-        )
-        fig.update_layout(
-            showlegend=False,
-            yaxis={'categoryorder':'total ascending'},
-            xaxis_title="Price (LKR)",
-            yaxis_title="Commodity"
-        )
+        def build_ranking_race():
+            colors = px.colors.qualitative.Plotly
+            commodity_names = sorted(set(race['Commodity_Name']))
+            color_of = {name: colors[i % len(colors)] for i, name in enumerate(commodity_names)}
+            
+            def race_traces(data, month):
+                return [{
+                    'type': 'bar', 'orientation': 'h',
+                    'x': data['Price'], 'y': data['Commodity_Name'],
+                    'marker': {'color': [color_of[name] for name in data['Commodity_Name']]},
+                    'hovertemplate': f'Commodity_Name=%{{y}}<br>Month={month}<br>Price=%{{x}}<extra></extra>',
+                }]
+            
+            fig = animated_figure(race, race_traces, mask=in_top_n, labels=race_frame, layout={
+                'title': {'text': f'Top {top_n} Most Expensive Commodities Each Month'},
+                'height': 600,
+                'xaxis': {'range': [0, race['Price'][in_top_n].max()*1.1]},
+            })
+            fig.update_layout(
+                showlegend=False,
+                yaxis={'categoryorder':'total ascending'},
+                xaxis_title="Price (LKR)",
+                yaxis_title="Commodity"
+            )
+            return fig
+
+        fig = cached_figure('ranking_race', {'top_n': top_n, 'frame': race_frame}, build_ranking_race)
         st.plotly_chart(fig, use_container_width=True)
     
     with tab3:
         st.subheader("Regional Price Change Waves")
         st.markdown("Visualize how price changes propagate across regions over time.")
         
-        # Calculate price changes
-        Food['Price_Change'] = Food.groupby(['Commodity_Name','Admin1_Name'])['Price'].pct_change()
-        geo_data = Food.dropna(subset=['Price_Change'])
-        
         # this code here to help users to select the category
         selected_category = st.selectbox(
             "Select commodity category",
-            options=Food['Commodity_Category'].unique()
+            options=Food['Commodity_Category'].unique().tolist()
         )
-        geo_data = geo_data[geo_data['Commodity_Category'] == selected_category]
+        waves = frames['price_change_waves']
+        in_category = waves['Commodity_Category'] == selected_category
+        wave_frame = pick_frame(waves, "Month", in_category)
         
         # Creating an animated map
-        fig = px.scatter_geo(
-            geo_data,
-            lat='Latitude',
-            lon='Longitude',
-            size=abs(geo_data['Price_Change'])*100,
-            color='Price_Change',
-            hover_name='Market_Name',
-            animation_frame=geo_data['Reference_Period_Start'].dt.strftime('%Y-%m'),
-            projection="natural earth",
-            title=f'Regional {selected_category} Price Change Intensity',
-            color_continuous_scale=px.colors.diverging.RdYlGn_r,
-            range_color=[-0.5, 0.5],
-            scope='asia',
-            height=600
-        )
-        fig.update_geos(
-            fitbounds="locations",
-            visible=False,
-            resolution=50,
-            showcountries=True,
-            countrycolor="Black"
-        )
-        fig.update_layout(
-            geo=dict(
-                landcolor='LightGrey',
-                subunitcolor="Grey",
-            ),
-            margin={"r":0,"t":50,"l":0,"b":0}
-        )
+        def build_price_change_waves():
+            # Price changes are precomputed per commodity and region at load time
+            sizeref = size_ref(np.abs(waves['Price_Change'][in_category]) * 100)
+            
+            def wave_traces(data, month):
+                return [{
+                    'type': 'scattergeo', 'mode': 'markers', 'showlegend': False,
+                    'lat': data['Latitude'], 'lon': data['Longitude'], 'hovertext': data['Market_Name'],
+                    'marker': {'color': data['Price_Change'], 'coloraxis': 'coloraxis',
+                               'size': np.abs(data['Price_Change']) * 100,
+                               'sizemode': 'area', 'sizeref': sizeref, 'symbol': 'circle'},
+                    'hovertemplate': f'<b>%{{hovertext}}</b><br><br>Month={month}<br>Latitude=%{{lat}}<br>Longitude=%{{lon}}<br>Price_Change=%{{marker.color}}<extra></extra>',
+                }]
+            
+            fig = animated_figure(waves, wave_traces, mask=in_category, labels=wave_frame, redraw=True, layout={
+                'title': {'text': f'Regional {selected_category} Price Change Intensity'},
+                'height': 600,
+                'geo': {'scope': 'asia', 'projection': {'type': 'natural earth'}},
+                'coloraxis': {
+                    'colorscale': [[i / (len(px.colors.diverging.RdYlGn_r) - 1), color]
+                                   for i, color in enumerate(px.colors.diverging.RdYlGn_r)],
+                    'cmin': -0.5, 'cmax': 0.5,
+                    'colorbar': {'title': {'text': 'Price_Change'}},
+                },
+            })
+            fig.update_geos(
+                fitbounds="locations",
+                visible=False,
+                resolution=50,
+                showcountries=True,
+                countrycolor="Black"
+            )
+            fig.update_layout(
+                geo=dict(
+                    landcolor='LightGrey',
+                    subunitcolor="Grey",
+                ),
+                margin={"r":0,"t":50,"l":0,"b":0}
+            )
+            return fig
+
+        fig = cached_figure('price_change_waves', {'category': selected_category, 'frame': wave_frame}, build_price_change_waves)
         st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("---")
@@ -209,28 +261,29 @@ st.markdown("Track Real-time shifts and historical trends in food prices across
 st.sidebar.title("Filter Data")
 locations = st.sidebar.multiselect(
     "Select Region", 
-    Food['Admin1_Name'].dropna().unique(), 
-    default=Food['Admin1_Name'].dropna().unique()
+    Food['Admin1_Name'].dropna().unique().tolist(), 
+    default=Food['Admin1_Name'].dropna().unique().tolist()
 )
 items = st.sidebar.multiselect(
     "Select Food Item", 
-    Food['Commodity_Name'].dropna().unique(), 
-    default=Food['Commodity_Name'].dropna().unique()
+    Food['Commodity_Name'].dropna().unique().tolist(), 
+    default=Food['Commodity_Name'].dropna().unique().tolist()
 )
 years = st.sidebar.slider(
     "Select Year Range", 
-    int(Food['Reference_Period_Start'].dt.year.min()), 
-    int(Food['Reference_Period_Start'].dt.year.max()), 
+    int(Food['Year'].min()), 
+    int(Food['Year'].max()), 
     (2023, 2024)
 )
 
-# Apply filters
-filtered = Food[
-    (Food['Admin1_Name'].isin(locations)) &
-    (Food['Commodity_Name'].isin(items)) &
-    (Food['Reference_Period_Start'].dt.year >= years[0]) &
-    (Food['Reference_Period_Start'].dt.year <= years[1])
-]
+# Apply filters (resolved from the prebuilt row index instead of scanning the frame)
+filtered = food_index.select(
+    Admin1_Name=locations,
+    Commodity_Name=items,
+    Year=slice(*years)
+)
+# Everything built from `filtered` is cached on these parameters
+filter_params = {'locations': set(locations), 'items': set(items), 'years': years}
 
 # Key metrics
 st.subheader("Key Metrics")
@@ -244,31 +297,37 @@ st.subheader("Data Table")
 st.dataframe(filtered)
 
 # Additional Interactivity
-commodity = st.sidebar.selectbox('Select Commodity', Food['Commodity_Name'].unique())
-price_type = st.sidebar.selectbox('Select Price Type', Food['Price_Type'].unique())
+commodity = st.sidebar.selectbox('Select Commodity', Food['Commodity_Name'].unique().tolist())
+price_type = st.sidebar.selectbox('Select Price Type', Food['Price_Type'].unique().tolist())
 date_range = st.sidebar.date_input(
     'Select Date Range', 
     [Food['Reference_Period_Start'].min(), Food['Reference_Period_End'].max()]
 )
 
-filtered_df = Food[
-    (Food['Commodity_Name'] == commodity) &
-    (Food['Price_Type'] == price_type) &
-    (Food['Reference_Period_Start'] >= pd.to_datetime(date_range[0])) &
-    (Food['Reference_Period_End'] <= pd.to_datetime(date_range[1]))
-]
+filtered_df = food_index.select(
+    Commodity_Name=commodity,
+    Price_Type=price_type,
+    Reference_Period_Start=slice(pd.to_datetime(date_range[0]), None),
+    Reference_Period_End=slice(None, pd.to_datetime(date_range[1]))
+)
+# Everything built from `filtered_df` is cached on these parameters
+detail_params = {'commodity': commodity, 'price_type': price_type, 'date_range': tuple(date_range)}
 
 # Price Change Sparlines
 st.subheader("Price Trends Sparklines")
-weekly = filtered_df.set_index('Reference_Period_Start').resample('W')['Price'].mean()
+def build_sparkline():
+    weekly = filtered_df.set_index('Reference_Period_Start').resample('W')['Price'].mean()
 
-fig = px.line(
-    weekly,
-    height=150,
-    title="",
-    markers=True
-)
-fig.update_layout(showlegend=False, margin=dict(t=10,b=10,l=10,r=10))
+    fig = px.line(
+        weekly,
+        height=150,
+        title="",
+        markers=True
+    )
+    fig.update_layout(showlegend=False, margin=dict(t=10,b=10,l=10,r=10))
+    return fig
+
+fig = cached_figure('sparkline', detail_params, build_sparkline)
 st.plotly_chart(fig, use_container_width=True)
 
 # Charts 
@@ -277,471 +336,603 @@ st.subheader(f' {commodity} Price Analysis ({price_type})')
 # Creating 3 tabs
 tab1, tab2, tab3 = st.tabs(["Trend Analysis", "Regional Comparison", "Price Distribution"])
 with tab1:
-    # Small multiple area charts
-    fig = px.area(
-        filtered_df,
-        x='Reference_Period_Start',
-        y='Price',
-        facet_col='Admin1_Name',
-        facet_col_wrap=3,  # 3 charts per row
-        height=400,
-        title=f"{commodity} Prices by District"
-    )
-    fig.update_yaxes(matches=None)  # Allow different y-scales
+    def build_district_area():
+        # Small multiple area charts (min/max bucketed per district to bound the payload)
+        fig = px.area(
+            downsample_series(filtered_df, 'Reference_Period_Start', 'Price', by='Admin1_Name', method='minmax'),
+            x='Reference_Period_Start',
+            y='Price',
+            facet_col='Admin1_Name',
+            facet_col_wrap=3,  # 3 charts per row
+            height=400,
+            title=f"{commodity} Prices by District"
+        )
+        fig.update_yaxes(matches=None)  # Allow different y-scales
+        return fig
+
+    fig = cached_figure('district_area', detail_params, build_district_area)
     st.plotly_chart(fig, use_container_width=True)
     
     # Compact stats instead of dataframe
-    latest = filtered_df.nlargest(1, 'Reference_Period_Start')
+    # Newest row in the selected range, read from the per-series snapshot as of the range end
+    latest = load_snapshots().latest(
+        as_of=pd.to_datetime(date_range[1]),
+        Commodity_Name=[commodity],
+        Price_Type=[price_type],
+        Reference_Period_Start=slice(pd.to_datetime(date_range[0]), None)
+    )
     st.metric("Latest Price", 
              f"{latest['Price'].values[0]:.2f} LKR", 
              f"{latest['Admin1_Name'].values[0]}")
 
 with tab2:
-    # Enhanced regional comparison
-    fig_regional = px.bar(
-        filtered_df,
-        x='Admin1_Name',
-        y='Price',
-        color='Admin1_Name',
-        title=f"{commodity} Prices Across Districts",
-        labels={'Price': 'Price (LKR)', 'Admin1_Name': 'District'},
-        height=500
-    )
-    fig_regional.update_layout(showlegend=False)
+    def build_district_bar():
+        # Enhanced regional comparison
+        fig_regional = px.bar(
+            filtered_df,
+            x='Admin1_Name',
+            y='Price',
+            color='Admin1_Name',
+            title=f"{commodity} Prices Across Districts",
+            labels={'Price': 'Price (LKR)', 'Admin1_Name': 'District'},
+            height=500
+        )
+        fig_regional.update_layout(showlegend=False)
+        return fig_regional
+
+    fig_regional = cached_figure('district_bar', detail_params, build_district_bar)
     st.plotly_chart(fig_regional, use_container_width=True)
     
     # Regional stats table
-    regional_stats = filtered_df.groupby('Admin1_Name')['Price'].agg(['mean', 'min', 'max'])
+    regional_stats = filtered_df.groupby('Admin1_Name', observed=True)['Price'].agg(['mean', 'min', 'max'])
     st.dataframe(
         regional_stats.style.format("{:.2f}"),
         use_container_width=True
     )
 
 with tab3:
-    # Enhanced distribution view
-    fig_dist = px.box(
-        filtered_df,
-        x='Admin1_Name',
-        y='Price',
-        color='Admin1_Name',
-        title=f"{commodity} Price Distribution by District",
-        points='all',
-        height=500
-    )
-    fig_dist.update_layout(showlegend=False)
-    st.plotly_chart(fig_dist, use_container_width=True)    
+    def build_district_box():
+        # Enhanced distribution view (points capped per district)
+        fig_dist = px.box(
+            sample_points(filtered_df, 'Price', by='Admin1_Name'),
+            x='Admin1_Name',
+            y='Price',
+            color='Admin1_Name',
+            title=f"{commodity} Price Distribution by District",
+            points='all',
+            height=500
+        )
+        fig_dist.update_layout(showlegend=False)
+        return fig_dist
+
+    fig_dist = cached_figure('district_box', detail_params, build_district_box)
+    st.plotly_chart(fig_dist, use_container_width=True)
     
     # Overall stats
     st.metric("Average Price", f"{filtered_df['Price'].mean():.2f} LKR")
     st.metric("Price Range", 
              f"{filtered_df['Price'].min():.2f} - {filtered_df['Price'].max():.2f} LKR")
 
-#Price alert system
-st.subheader("Price Alert System")
-alert_threshold = st.sidebar.number_input("Set price alert threshold (LKR)", min_value=0)
-exceeded = filtered[filtered['Price'] > alert_threshold]
-if len(exceeded) > 0:
-    st.warning(f"{len(exceeded)} records exceed {alert_threshold} LKR:")
-    st.dataframe(exceeded[['Commodity_Name', 'Market_Name', 'Price']].sort_values('Price', ascending=False))
-
-# Geomap 
-st.subheader("Geographic Distribution of Food Prices")
-fig_map = px.scatter_mapbox(
-    filtered_df,
-    lat="Latitude",
-    lon="Longitude",
-    color="Commodity_Name",
-    size="Price",
-    hover_name="Commodity_Name",
-    hover_data=["Admin1_Name", "Price", "Unit"],
-    zoom=6,
-    height=500,
-    title="Geographic Distribution of Food Prices"
-)
-fig_map.update_layout(mapbox_style="carto-positron")
-fig_map.update_layout(margin={"r":0,"t":50,"l":0,"b":0})
-st.plotly_chart(fig_map)
+#Price alert system (own fragment so moving the threshold only reruns this section)
+@st.fragment
+def price_alert_section(filtered):
+    st.subheader("Price Alert System")
+    alert_threshold = st.number_input("Set price alert threshold (LKR)", min_value=0)
+    exceeded = filtered[filtered['Price'] > alert_threshold]
+    if len(exceeded) > 0:
+        st.warning(f"{len(exceeded)} records exceed {alert_threshold} LKR:")
+        st.dataframe(exceeded[['Commodity_Name', 'Market_Name', 'Price']].sort_values('Price', ascending=False))
+
+price_alert_section(filtered)
+
+# Marker grouping choices shared by the maps, cell sizes follow the map zoom
+MAP_GROUPINGS = grouping_options()
+
+# Geomap (rendered on demand, the map is one of the heaviest figures on the page)
+@st.fragment
+def geo_map_section(filtered_df, detail_params):
+    st.subheader("Geographic Distribution of Food Prices")
+    if not st.toggle("Show map", key="show_geo_map"):
+        return
+    grouping = st.radio("Group markers by", list(MAP_GROUPINGS), horizontal=True, key="geo_map_grouping")
+    def build_geo_map():
+        # One marker per market (or grid cell), commodity and unit instead of one per record
+        markers = aggregate_points(filtered_df, ['Commodity_Name', 'Unit'], cell=MAP_GROUPINGS[grouping], first=['Admin1_Name'])
+        fig_map = px.scatter_mapbox(
+            markers,
+            lat="Latitude",
+            lon="Longitude",
+            color="Commodity_Name",
+            size="Price",
+            hover_name="Commodity_Name",
+            hover_data={"Admin1_Name": True, "Price": ":.2f", "Price_Min": ":.2f", "Price_Max": ":.2f", "Unit": True, "Records": True},
+            zoom=6,
+            height=500,
+            title="Geographic Distribution of Food Prices"
+        )
+        fig_map.update_layout(mapbox_style="carto-positron")
+        fig_map.update_layout(margin={"r":0,"t":50,"l":0,"b":0})
+        return fig_map
+
+    fig_map = cached_figure('geo_map', {**detail_params, 'grouping': grouping}, build_geo_map)
+    st.plotly_chart(fig_map)
+
+geo_map_section(filtered_df, detail_params)
 
 # Overall distribution
 st.subheader("Commodity Distribution")
-commodity_counts = Food['Commodity_Name'].value_counts().reset_index()
-commodity_counts.columns = ['Commodity_Name', 'Count']
-
-fig_pie = px.pie(
-    commodity_counts, 
-    values='Count', 
-    names='Commodity_Name', 
-    title="Overall Commodity Distribution", 
-    hole=0.2
-)
-st.plotly_chart(fig_pie)
+def build_commodity_pie():
+    commodity_counts = Food['Commodity_Name'].value_counts().reset_index()
+    commodity_counts.columns = ['Commodity_Name', 'Count']
+
+    fig_pie = px.pie(
+        commodity_counts, 
+        values='Count', 
+        names='Commodity_Name', 
+        title="Overall Commodity Distribution", 
+        hole=0.2
+    )
+    return fig_pie
 
+fig_pie = cached_figure('commodity_pie', {}, build_commodity_pie)
+st.plotly_chart(fig_pie)
 
-# Create simplified pie chart
-st.subheader("Commodity Distribution")
-px.pie(
-    Food, 
-    names='Commodity_Name', 
-    title="Share of Each Commodity in Dataset"
-).update_traces(
-    textposition='inside',
-    textinfo='percent+label'
-)
 
 # Simplified grouped bar chart
 st.subheader("Average Prices by Region & Category")
-fig = px.bar(
-    filtered.groupby(['Admin1_Name', 'Commodity_Category'])['Standardized_Price'].mean().reset_index(),
-    x='Admin1_Name',
-    y='Standardized_Price',
-    color='Commodity_Category',
-    barmode='group',
-    title='Average Prices Across Regions',
-    labels={'Standardized_Price': 'Avg Price', 'Admin1_Name': 'Region'},
-    height=500
-)
-fig.update_layout(
-    xaxis={'categoryorder':'total descending'},
-    yaxis_title="Average Standardized Price"
-)
+def build_region_category_bar():
+    fig = px.bar(
+        summarize(
+            slice_cube(rollups['region_category'], Admin1_Name=locations, Commodity_Name=items, Year=slice(*years)),
+            ['Admin1_Name', 'Commodity_Category']
+        )['mean'].rename('Standardized_Price').reset_index(),
+        x='Admin1_Name',
+        y='Standardized_Price',
+        color='Commodity_Category',
+        barmode='group',
+        title='Average Prices Across Regions',
+        labels={'Standardized_Price': 'Avg Price', 'Admin1_Name': 'Region'},
+        height=500
+    )
+    fig.update_layout(
+        xaxis={'categoryorder':'total descending'},
+        yaxis_title="Average Standardized Price"
+    )
+    return fig
+
+fig = cached_figure('region_category_bar', filter_params, build_region_category_bar)
 st.plotly_chart(fig, use_container_width=True)
 
 # Create a simple heatmap
 st.subheader("Market Commodity Distribution")
-fig = px.density_heatmap(
-    filtered,
-    x='Market_Name',
-    y='Commodity_Category',
-    title="Commodity Availability by Market",
-    height=500
-)
-fig.update_layout(
-    xaxis_title="Market",
-    yaxis_title="Commodity Category",
-    xaxis={'categoryorder':'total descending'}
-)
+def build_market_heatmap():
+    fig = px.density_heatmap(
+        filtered,
+        x='Market_Name',
+        y='Commodity_Category',
+        title="Commodity Availability by Market",
+        height=500
+    )
+    fig.update_layout(
+        xaxis_title="Market",
+        yaxis_title="Commodity Category",
+        xaxis={'categoryorder':'total descending'}
+    )
+    return fig
+
+fig = cached_figure('market_heatmap', filter_params, build_market_heatmap)
 st.plotly_chart(fig, use_container_width=True)
 
 # Top 10 volatile commodities
 st.subheader("Top 10 Volatile Commodities ")
-volatility = filtered.groupby("Commodity_Name")["Price_Std"].mean().sort_values(ascending=False).head(10).reset_index()
-fig4 = px.bar(
-    volatility, 
-    x="Commodity_Name", 
-    y="Price_Std", 
-    color="Commodity_Name", 
-    title="Top 10 Most Volatile Commodities (Based on Std Dev)"
-)
-fig4.update_layout(height=500)
+def build_volatile_commodities():
+    # Std of the filtered rows, read from the volatility engine's prefix sums
+    volatility = load_volatility().summary(
+        'Commodity_Name', 'Standardized_Price',
+        start=f"{years[0]}-01-01", end=f"{years[1]}-12-31",
+        Admin1_Name=locations, Commodity_Name=items
+    )['std'].nlargest(10).rename('Price_Std').reset_index()
+    fig4 = px.bar(
+        volatility, 
+        x="Commodity_Name", 
+        y="Price_Std", 
+        color="Commodity_Name", 
+        title="Top 10 Most Volatile Commodities (Based on Std Dev)"
+    )
+    fig4.update_layout(height=500)
+    return fig4
+
+fig4 = cached_figure('volatile_commodities', filter_params, build_volatile_commodities)
 st.plotly_chart(fig4, use_container_width=True)
 
-# Create a box plot for price distribution across markets
-st.subheader("Price Distribution by Market")
-fig = px.box(
-    filtered,
-    x="Market_Name",
-    y="Price",
-    title="Price Distribution Across Markets",
-    height=600
-)
-fig.update_layout(
-    xaxis_title="Market",
-    yaxis_title="Price (LKR)",
-    xaxis={'categoryorder':'total descending'},  # Sort by median price
-    showlegend=False
-)
-st.plotly_chart(fig, use_container_width=True)
+# Box plot for price distribution across markets (rendered on demand)
+@st.fragment
+def market_box_section(filtered, filter_params):
+    st.subheader("Price Distribution by Market")
+    if not st.toggle("Show market distribution", key="show_market_box"):
+        return
+    def build_market_box():
+        fig = px.box(
+            sample_points(filtered, 'Price', by='Market_Name'),
+            x="Market_Name",
+            y="Price",
+            title="Price Distribution Across Markets",
+            height=600
+        )
+        fig.update_layout(
+            xaxis_title="Market",
+            yaxis_title="Price (LKR)",
+            xaxis={'categoryorder':'total descending'},  # Sort by median price
+            showlegend=False
+        )
+        return fig
+
+    fig = cached_figure('market_box', filter_params, build_market_box)
+    st.plotly_chart(fig, use_container_width=True)
+
+market_box_section(filtered, filter_params)
 
 # Monthly trend summary
 st.subheader("Monthly prices by commodity category")
-monthly = filtered.groupby(["Start_Month", "Commodity_Category"])["Price_Std"].mean().reset_index()
-fig6 = px.line(
-    monthly, 
-    x="Start_Month", 
-    y="Price_Std", 
-    color="Commodity_Category", 
-    markers=True, 
-    title="Standard Monthly Prices by Commodity Category"
-)
-fig6.update_layout(height=500)
-st.plotly_chart(fig6, use_container_width=True)
-
-# Price Comparison Tool
-st.subheader("Price Comparison Tool")
-col1, col2 = st.columns(2)
-with col1:
-    compare_commodity = st.selectbox("Select Commodity to Compare", Food['Commodity_Name'].unique())
-with col2:
-    compare_regions = st.multiselect(
-        "Select Regions to Compare", 
-        Food['Admin1_Name'].unique(), 
-        default=Food['Admin1_Name'].unique()[:3]
+def build_category_monthly():
+    monthly = filtered.groupby(["Start_Month", "Commodity_Category"], observed=True)["Price_Std"].mean().reset_index()
+    fig6 = px.line(
+        monthly, 
+        x="Start_Month", 
+        y="Price_Std", 
+        color="Commodity_Category", 
+        markers=True, 
+        title="Standard Monthly Prices by Commodity Category"
     )
+    fig6.update_layout(height=500)
+    return fig6
 
-compare_df = Food[
-    (Food['Commodity_Name'] == compare_commodity) &
-    (Food['Admin1_Name'].isin(compare_regions))
-]
-
-if not compare_df.empty:
-    fig_compare = px.line(
-        compare_df, 
-        x='Reference_Period_Start', 
-        y='Price', 
-        color='Admin1_Name',
-        title=f'{compare_commodity} Price Comparison Across Regions',
-        markers=True,
-        line_shape='spline'
-    )
-    st.plotly_chart(fig_compare, use_container_width=True)
-    
-    # Add statistical summary
-    st.write("Statistical Summary")
-    stats = compare_df.groupby('Admin1_Name')['Price'].agg(['mean', 'median', 'std', 'min', 'max'])
-    st.dataframe(stats.style.background_gradient(cmap='Blues'))
-else:
-    st.warning("No data available for the selected filters.")
-
-# Interactive Correlation Matrix
-st.subheader("Price Correlations Between Commodities")
-corr_region = st.selectbox(
-    "Select Region for Correlation Analysis", 
-    Food['Admin1_Name'].unique()
-)
+fig6 = cached_figure('category_monthly', filter_params, build_category_monthly)
+st.plotly_chart(fig6, use_container_width=True)
 
-# Pivot data for correlation
-corr_df = Food[Food['Admin1_Name'] == corr_region].pivot_table(
-    index='Reference_Period_Start',
-    columns='Commodity_Name',
-    values='Price',
-    aggfunc='mean'
-).corr()
-
-# Create heatmap
-fig_corr = px.imshow(
-    corr_df,
-    labels=dict(x="Commodity", y="Commodity", color="Correlation"),
-    x=corr_df.columns,
-    y=corr_df.columns,
-    color_continuous_scale='RdBu',
-    zmin=-1,
-    zmax=1,
-    title=f"Price Correlation Matrix for {corr_region}"
-)
-fig_corr.update_layout(height=800)
-st.plotly_chart(fig_corr, use_container_width=True)
+# Price Comparison Tool (own fragment, its selectors only rerun this section)
+@st.fragment
+def price_comparison_section():
+    st.subheader("Price Comparison Tool")
+    col1, col2 = st.columns(2)
+    with col1:
+        compare_commodity = st.selectbox("Select Commodity to Compare", Food['Commodity_Name'].unique().tolist())
+    with col2:
+        compare_regions = st.multiselect(
+            "Select Regions to Compare", 
+            Food['Admin1_Name'].unique().tolist(), 
+            default=Food['Admin1_Name'].unique().tolist()[:3]
+        )
 
+    compare_df = food_index.select(
+        Commodity_Name=compare_commodity,
+        Admin1_Name=compare_regions
+    )
 
-st.subheader("Price Trends Overtime")
-# Limit to 3 commodities max
-selected_commodities = st.multiselect(
-    "Select commodities (max 3)",
-    options=sorted(filtered['Commodity_Name'].unique()),
-    default=sorted(filtered['Commodity_Name'].unique())[:2],
-    max_selections=3
-)
+    if not compare_df.empty:
+        def build_price_comparison():
+            fig_compare = px.line(
+                downsample_series(compare_df, 'Reference_Period_Start', 'Price', by='Admin1_Name'), 
+                x='Reference_Period_Start', 
+                y='Price', 
+                color='Admin1_Name',
+                title=f'{compare_commodity} Price Comparison Across Regions',
+                markers=True,
+                line_shape='spline'
+            )
+            return fig_compare
 
-if selected_commodities:
-    # Aggregate to monthly national averages
-    compare_data = filtered[filtered['Commodity_Name'].isin(selected_commodities)]
-    compare_data['Month'] = compare_data['Reference_Period_Start'].dt.to_period('M').astype(str)
-    national_avg = compare_data.groupby(['Month', 'Commodity_Name'])['Price'].mean().reset_index()
+        fig_compare = cached_figure('price_comparison', {'commodity': compare_commodity, 'regions': set(compare_regions)}, build_price_comparison)
+        st.plotly_chart(fig_compare, use_container_width=True)
     
-    fig = px.line(
-        national_avg,
-        x='Month',
-        y='Price',
-        color='Commodity_Name',
-        line_dash='Commodity_Name',
-        markers=True,
-        title='National Average Price Comparison',
-        labels={'Price': 'Price (LKR)'},
-        template='plotly_white'
+        # Add statistical summary
+        st.write("Statistical Summary")
+        stats = compare_df.groupby('Admin1_Name', observed=True)['Price'].agg(['mean', 'median', 'std', 'min', 'max'])
+        st.dataframe(stats.style.background_gradient(cmap='Blues'))
+    else:
+        st.warning("No data available for the selected filters.")
+
+price_comparison_section()
+
+# Interactive Correlation Matrix (rendered on demand, reruns only when its region changes)
+@st.fragment
+def correlation_section():
+    st.subheader("Price Correlations Between Commodities")
+    if not st.toggle("Show correlation matrix", key="show_correlation"):
+        return
+    corr_region = st.selectbox(
+        "Select Region for Correlation Analysis", 
+        Food['Admin1_Name'].unique().tolist()
     )
-    fig.update_layout(
-        hovermode='x unified',
-        legend_title_text='Commodity',
-        xaxis=dict(tickangle=45),
-        height=500
+
+    def build_correlation():
+        # Precomputed at startup, switching region is a lookup
+        corr_df = load_correlations().matrix(corr_region)
+
+        # Create heatmap
+        fig_corr = px.imshow(
+            corr_df,
+            labels=dict(x="Commodity", y="Commodity", color="Correlation"),
+            x=corr_df.columns,
+            y=corr_df.columns,
+            color_continuous_scale='RdBu',
+            zmin=-1,
+            zmax=1,
+            title=f"Price Correlation Matrix for {corr_region}"
+        )
+        fig_corr.update_layout(height=800)
+        return fig_corr
+
+    fig_corr = cached_figure('correlation', {'region': corr_region}, build_correlation)
+    st.plotly_chart(fig_corr, use_container_width=True)
+
+correlation_section()
+
+# Price Trends Overtime (own fragment, its commodity picker only reruns this section)
+@st.fragment
+def price_trends_section(filtered, filter_params):
+    st.subheader("Price Trends Overtime")
+    # Limit to 3 commodities max
+    selected_commodities = st.multiselect(
+        "Select commodities (max 3)",
+        options=sorted(filtered['Commodity_Name'].unique()),
+        default=sorted(filtered['Commodity_Name'].unique())[:2],
+        max_selections=3
     )
+
+    if selected_commodities:
+        def build_national_trends():
+            # Aggregate to monthly national averages
+            compare_data = filtered[filtered['Commodity_Name'].isin(selected_commodities)]
+            national_avg = compare_data.groupby(['Month', 'Commodity_Name'], observed=True)['Price'].mean().reset_index()
     
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.warning("Please select at least one commodity")
-
-# Geographic Map with Month & Commodity Category Filters
-st.subheader("Interactive Price Map by Month & Commodity Category")
-col1, col2 = st.columns(2)
-with col1:
-    selected_month = st.select_slider(
-        "Select Month",
-        options=sorted(filtered['Start_Month'].unique()),
-        value=filtered['Start_Month'].min()
-    )
-with col2:
-    selected_category = st.selectbox(
-        "Select Commodity Category",
-        options=filtered['Commodity_Category'].unique()
-    )
-month_category_filtered = filtered[filtered['Commodity_Category'] == selected_category]
-if selected_month in month_category_filtered['Start_Month'].unique():
-    month_category_filtered = month_category_filtered[month_category_filtered['Start_Month'] == selected_month]
-else:
-    st.warning(f"No {selected_category} data for month {selected_month}. Showing all months.")
-month_category_filtered['Size_Adjusted'] = month_category_filtered['Price'] * 10  # Adjust multiplier
-if not month_category_filtered.empty:
-    fig_enhanced_map = px.scatter_mapbox(
-        month_category_filtered,
-        lat="Latitude",
-        lon="Longitude",
-        color="Commodity_Name",
-        size="Size_Adjusted", 
-        hover_name="Market_Name",
-        hover_data=["Price", "Unit", "Reference_Period_Start"],
-        zoom=6,
-        height=600,
-        title=f"Prices in {selected_category} (Month: {selected_month})",
-    )
-    fig_enhanced_map.update_layout(
-        mapbox_style="carto-positron",
-        margin={"r": 0, "t": 50, "l": 0, "b": 0},
+            fig = px.line(
+                national_avg,
+                x='Month',
+                y='Price',
+                color='Commodity_Name',
+                line_dash='Commodity_Name',
+                markers=True,
+                title='National Average Price Comparison',
+                labels={'Price': 'Price (LKR)'},
+                template='plotly_white'
+            )
+            fig.update_layout(
+                hovermode='x unified',
+                legend_title_text='Commodity',
+                xaxis=dict(tickangle=45),
+                height=500
+            )
+            return fig
+
+        fig = cached_figure('national_trends', {**filter_params, 'commodities': set(selected_commodities)}, build_national_trends)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("Please select at least one commodity")
+
+price_trends_section(filtered, filter_params)
+
+# Geographic Map with Month & Commodity Category Filters (rendered on demand)
+@st.fragment
+def month_category_map_section(filtered, filter_params):
+    st.subheader("Interactive Price Map by Month & Commodity Category")
+    if not st.toggle("Show price map", key="show_month_category_map"):
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        months = sorted(filtered['Month'].unique().tolist())
+        selected_month = st.select_slider(
+            "Select Month",
+            options=months,
+            value=months[0]
+        )
+    with col2:
+        selected_category = st.selectbox(
+            "Select Commodity Category",
+            options=filtered['Commodity_Category'].unique().tolist()
+        )
+    # The price each market had at the end of the month, looked up per series
+    # by binary search instead of masking the rows on the month
+    month_category_filtered = load_price_history().prices_at(
+        pd.Period(selected_month, 'M').end_time.normalize(),
+        until='Reference_Period_End',
+        Admin1_Name=filter_params['locations'],
+        Commodity_Name=filter_params['items'],
+        Commodity_Category=[selected_category]
     )
-    st.plotly_chart(fig_enhanced_map, use_container_width=True)
-else:
-    st.error("No data available for the selected filters.")
+    grouping = st.radio("Group markers by", list(MAP_GROUPINGS), horizontal=True, key="month_category_map_grouping")
+    if not month_category_filtered.empty:
+        def build_month_category_map():
+            markers = aggregate_points(
+                month_category_filtered, ['Commodity_Name', 'Unit'], cell=MAP_GROUPINGS[grouping],
+                first=['Market_Name', 'Reference_Period_Start'], distinct=['Market_Name']
+            )
+            fig_enhanced_map = px.scatter_mapbox(
+                markers,
+                lat="Latitude",
+                lon="Longitude",
+                color="Commodity_Name",
+                size=(markers['Price'] * 10).rename('Size_Adjusted'),  # Adjust multiplier
+                hover_name="Market_Name",
+                hover_data={"Price": ":.2f", "Price_Min": ":.2f", "Price_Max": ":.2f", "Unit": True,
+                            "Reference_Period_Start": True, "Records": True, "Market_Name_Count": True},
+                labels={"Market_Name_Count": "Markets"},
+                zoom=6,
+                height=600,
+                title=f"Prices in {selected_category} (Month: {selected_month})",
+            )
+            fig_enhanced_map.update_layout(
+                mapbox_style="carto-positron",
+                margin={"r": 0, "t": 50, "l": 0, "b": 0},
+            )
+            return fig_enhanced_map
+
+        fig_enhanced_map = cached_figure('month_category_map', {**filter_params, 'month': selected_month, 'category': selected_category, 'grouping': grouping}, build_month_category_map)
+        st.plotly_chart(fig_enhanced_map, use_container_width=True)
+    else:
+        st.error("No data available for the selected filters.")
+
+month_category_map_section(filtered, filter_params)
 
 # Top 10 Districts by Commodity Category Distribution (Interactive)
 st.subheader("Top 10 Districts by Commodity Category")
-top_admin2 = Food['Provider_Admin2_Name'].value_counts().nlargest(10).index
+top_admin2 = pd.Index(load_rankings()['district_records'].top(10)['Provider_Admin2_Name'])
 filtered_df = Food[Food['Provider_Admin2_Name'].isin(top_admin2)]
 
 # Plot 1: Stacked bar chart by commodity category
-fig1 = px.bar(
-    filtered_df,
-    y='Provider_Admin2_Name',
-    color='Commodity_Category',
-    title='Commodity Distribution in Top 10 Districts',
-    labels={'Provider_Admin2_Name': 'District', 'count': 'Number of Records'},
-    category_orders={'Provider_Admin2_Name': top_admin2},
-    color_discrete_sequence=px.colors.qualitative.Pastel,
-    height=500
-)
-fig1.update_layout(barmode='stack', yaxis={'categoryorder':'total ascending'})
+def build_top_district_categories():
+    fig1 = px.bar(
+        filtered_df,
+        y='Provider_Admin2_Name',
+        color='Commodity_Category',
+        title='Commodity Distribution in Top 10 Districts',
+        labels={'Provider_Admin2_Name': 'District', 'count': 'Number of Records'},
+        category_orders={'Provider_Admin2_Name': top_admin2},
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        height=500
+    )
+    fig1.update_layout(barmode='stack', yaxis={'categoryorder':'total ascending'})
+    return fig1
+
+fig1 = cached_figure('top_district_categories', {}, build_top_district_categories)
 st.plotly_chart(fig1, use_container_width=True)
 
 
 #Commodity distribution across provinces
 st.subheader("Commodity Distribution Across Provinces")
-fig = px.bar(
-    Food,
-    x='Provider_Admin1_Name',
-    color='Commodity_Category',
-    title='Food Commodities by Province',
-    labels={'Provider_Admin1_Name': 'Province', 'count': 'Number of Records'},
-    color_discrete_sequence=px.colors.qualitative.Pastel,
-    height=500
-)
-fig.update_layout(
-    barmode='stack',
-    xaxis={'categoryorder':'total descending'},
-    hovermode='x unified',
-    legend_title_text='Commodity Category'
-)
+def build_province_categories():
+    fig = px.bar(
+        Food,
+        x='Provider_Admin1_Name',
+        color='Commodity_Category',
+        title='Food Commodities by Province',
+        labels={'Provider_Admin1_Name': 'Province', 'count': 'Number of Records'},
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        height=500
+    )
+    fig.update_layout(
+        barmode='stack',
+        xaxis={'categoryorder':'total descending'},
+        hovermode='x unified',
+        legend_title_text='Commodity Category'
+    )
+    return fig
+
+fig = cached_figure('province_categories', {}, build_province_categories)
 st.plotly_chart(fig, use_container_width=True)
 
 
-fig2 = px.bar(
-    filtered_df['Provider_Admin2_Name'].value_counts().reset_index(),
-    y='Provider_Admin2_Name',
-    x='count',
-    title='Total Records in Top 10 Districts',
-    labels={'Provider_Admin2_Name': 'District', 'count': 'Number of Records'},
-    color='count',
-    color_continuous_scale='Bluered',
-    height=500
-)
-fig2.update_layout(yaxis={'categoryorder':'total ascending'})
+def build_top_district_records():
+    fig2 = px.bar(
+        filtered_df['Provider_Admin2_Name'].value_counts().loc[lambda counts: counts > 0].reset_index(),
+        y='Provider_Admin2_Name',
+        x='count',
+        title='Total Records in Top 10 Districts',
+        labels={'Provider_Admin2_Name': 'District', 'count': 'Number of Records'},
+        color='count',
+        color_continuous_scale='Bluered',
+        height=500
+    )
+    fig2.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig2
+
+fig2 = cached_figure('top_district_records', {}, build_top_district_records)
 st.plotly_chart(fig2, use_container_width=True)
 
 st.subheader("Market Price Comparison")
-market_prices = filtered.groupby(['Market_Name', 'Commodity_Category'])['Price'].mean().unstack()
-fig = px.imshow(
-    market_prices,
-    labels=dict(x="Category", y="Market", color="Price"),
-    color_continuous_scale='Viridis',
-    aspect="auto"
-)
+def build_market_prices():
+    market_prices = summarize(
+        slice_cube(rollups['market_category'], Admin1_Name=locations, Commodity_Name=items, Year=slice(*years)),
+        ['Market_Name', 'Commodity_Category']
+    )['mean'].unstack()
+    fig = px.imshow(
+        market_prices,
+        labels=dict(x="Category", y="Market", color="Price"),
+        color_continuous_scale='Viridis',
+        aspect="auto"
+    )
+    return fig
+
+fig = cached_figure('market_prices', filter_params, build_market_prices)
 st.plotly_chart(fig, use_container_width=True)
 
 # price characteristics by category chart
 st.subheader("Price Characteristics by Category")
-radar_data = filtered.groupby('Commodity_Category').agg({
-    'Price': 'mean',
-    'Price_Std': 'mean',
-    'Price_Median': 'mean'
-}).reset_index()
-fig = px.line_polar(
-    radar_data, 
-    r='Price', 
-    theta='Commodity_Category',
-    line_close=True,
-    template="plotly_dark"
-)
+def build_category_radar():
+    radar_data = filtered.groupby('Commodity_Category', observed=True).agg({
+        'Price': 'mean',
+        'Price_Std': 'mean',
+        'Price_Median': 'mean'
+    }).reset_index()
+    fig = px.line_polar(
+        radar_data, 
+        r='Price', 
+        theta='Commodity_Category',
+        line_close=True,
+        template="plotly_dark"
+    )
+    return fig
+
+fig = cached_figure('category_radar', filter_params, build_category_radar)
 st.plotly_chart(fig, use_container_width=True)
 
-# regional affordability chart
-avg_income = 50000 
-filtered['Price_to_Income_Ratio'] = filtered['Price'] / avg_income * 100
+# regional affordability chart (Price_to_Income_Ratio is computed at load time)
 st.subheader("Regional Affordability compared with income")
-region_affordability = filtered.groupby('Admin1_Name').agg({
-    'Price': 'median',
-    'Price_to_Income_Ratio': 'median'
-}).reset_index()
-fig = px.scatter(
-    region_affordability,
-    x='Price',
-    y='Price_to_Income_Ratio',
-    size='Price',
-    color='Admin1_Name',
-    hover_name='Admin1_Name',
-    log_x=True,
-    size_max=40
-)
+def build_region_affordability():
+    region_affordability = filtered.groupby('Admin1_Name', observed=True).agg({
+        'Price': 'median',
+        'Price_to_Income_Ratio': 'median'
+    }).reset_index()
+    fig = px.scatter(
+        region_affordability,
+        x='Price',
+        y='Price_to_Income_Ratio',
+        size='Price',
+        color='Admin1_Name',
+        hover_name='Admin1_Name',
+        log_x=True,
+        size_max=40
+    )
+    return fig
+
+fig = cached_figure('region_affordability', filter_params, build_region_affordability)
 st.plotly_chart(fig, use_container_width=True)
 
 # Ranking food affordability from worst to best (districts) 
-ranking = Food.groupby('Admin2_Name')['Price'].mean().reset_index()
+ranking = load_rankings()['district_price'].ranked
 st.subheader('Affordability Ranking compared with price')
-fig = px.bar(ranking.sort_values('Price', ascending=False),
-             x='Admin2_Name',
-             y='Price',
-             color='Price')
+def build_district_ranking():
+    fig = px.bar(ranking,
+                 x='Admin2_Name',
+                 y='Price',
+                 color='Price')
+    return fig
+
+fig = cached_figure('district_ranking', {}, build_district_ranking)
 st.plotly_chart(fig, use_container_width=True)
 
 # Calculate yearly volatility (simplified)
-Food['Year'] = pd.to_datetime(Food['Reference_Period_Start']).dt.year
-volatility = Food.groupby('Year')['Price'].std() / Food.groupby('Year')['Price'].mean()
+volatility = summarize(rollups['yearly'], ['Year'])['cv']
 volatility = volatility.sort_values(ascending=False).reset_index(name='Volatility')
 
 st.subheader('Yearly Price Volatility Ranking')
-fig = px.bar(volatility, 
-             x='Year', 
-             y='Volatility',
-             color='Volatility',
-             color_continuous_scale='reds',
-             text='Volatility')
-fig.update_traces(texttemplate='%{text:.2f}', textposition='outside')
-fig.update_layout(yaxis_title='Price Volatility Index')
+def build_yearly_volatility():
+    fig = px.bar(volatility, 
+                 x='Year', 
+                 y='Volatility',
+                 color='Volatility',
+                 color_continuous_scale='reds',
+                 text='Volatility')
+    fig.update_traces(texttemplate='%{text:.2f}', textposition='outside')
+    fig.update_layout(yaxis_title='Price Volatility Index')
+    return fig
+
+fig = cached_figure('yearly_volatility', {}, build_yearly_volatility)
 st.plotly_chart(fig, use_container_width=True)
 st.dataframe(volatility.style.background_gradient(cmap='Reds'))
 
-# All 11 urban districts
-urban = ['Colombo', 'Gampaha', 'Kandy', 'Kalutara',
-         'Galle', 'Matara', 'Negombo', 'Kurunegala',
-         'Anuradhapura', 'Ratnapura', 'Badulla']
-
-Food['Type'] = Food['Admin2_Name'].apply(lambda x: 'Urban' if x in urban else 'Rural')
-prices = Food.groupby('Type')['Price'].median()
+# Urban/Rural Type comes from the urban district list in data_loader
+prices = Food.groupby('Type', observed=True)['Price'].median()
 
 # Display results
 st.subheader('Urban vs Rural Price Comparison')
@@ -750,6 +941,22 @@ st.write(f"Urban Median: LKR {prices['Urban']:,.0f}")
 st.write(f"Rural Median: LKR {prices['Rural']:,.0f}")
 st.write(f"Difference: LKR {prices['Rural']-prices['Urban']:,.0f}")
 
-# Add near data table
-st.download_button("Export Filtered Data", filtered.to_csv(), "food_prices.csv")
+# Export of the filtered data, built only once asked for and cached per selection
+@st.fragment
+def export_section(filtered, filter_params):
+    format_label = st.selectbox("Export format", list(EXPORT_FORMATS), key="export_format")
+    extension, mime = EXPORT_FORMATS[format_label]
+    key = export_key(extension, filter_params)
+    if st.session_state.get("export_ready") != key:
+        if not st.button("Prepare export"):
+            return
+        st.session_state["export_ready"] = key
+    st.download_button(
+        "Export Filtered Data",
+        export_bytes(filtered, extension, filter_params),
+        f"food_prices.{extension}",
+        mime=mime
+    )
+
+export_section(filtered, filter_params)
 
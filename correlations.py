@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+# Sums behind a pairwise complete Pearson correlation of every commodity pair
+# in every region, over the average price per Reference_Period_Start. Kept as
+# arrays of shape (regions, commodities, commodities):
+#   n[r, i, j]    periods where both i and j have a price
+#   sx[r, i, j]   sum of i's (shifted) prices over those periods
+#   sxx[r, i, j]  sum of i's squared (shifted) prices over those periods
+#   sxy[r, i, j]  sum of i * j over those periods
+# Sums only ever grow, so new periods are folded in without touching old ones.
+# Prices are shifted by a per region/commodity offset fixed at build time,
+# which keeps the sums small without changing the correlation.
+class CorrelationService:
+    def __init__(self, df, region='Admin1_Name', item='Commodity_Name', value='Price', period='Reference_Period_Start'):
+        self.region, self.item, self.value, self.period = region, item, value, period
+        self.regions = []
+        self.items = []
+        self.shift = np.zeros((0, 0))
+        self.n = self.sx = self.sxx = self.sxy = np.zeros((0, 0, 0))
+        self.last_period = None
+        self._matrices = {}
+        self.update(df)
+
+    def _cube(self, df):
+        means = df.groupby([self.region, self.period, self.item], observed=True)[self.value].mean()
+        regions = means.index.get_level_values(0).unique().tolist()
+        items = means.index.get_level_values(2).unique().tolist()
+        self._extend(regions, items)
+        periods = means.index.get_level_values(1).unique().sort_values()
+        cube = np.full((len(self.regions), len(periods), len(self.items)), np.nan)
+        cube[
+            pd.Index(self.regions).get_indexer(means.index.get_level_values(0)),
+            periods.get_indexer(means.index.get_level_values(1)),
+            pd.Index(self.items).get_indexer(means.index.get_level_values(2)),
+        ] = means.to_numpy('float64')
+        return cube, periods
+
+    # Grows the arrays for regions or commodities seen for the first time
+    def _extend(self, regions, items):
+        new_regions = [r for r in regions if r not in self.regions]
+        new_items = [i for i in items if i not in self.items]
+        if not new_regions and not new_items:
+            return
+        old_r, old_k = len(self.regions), len(self.items)
+        self.regions += new_regions
+        self.items += new_items
+        r, k = len(self.regions), len(self.items)
+        for name in ['n', 'sx', 'sxx', 'sxy']:
+            grown = np.zeros((r, k, k))
+            grown[:old_r, :old_k, :old_k] = getattr(self, name)
+            setattr(self, name, grown)
+        shift = np.full((r, k), np.nan)
+        shift[:old_r, :old_k] = self.shift
+        self.shift = shift
+
+    # Adds the periods of `df` newer than the last one already included. A
+    # period can only be added once, revisions to old periods need a rebuild.
+    def update(self, df):
+        if self.last_period is not None:
+            df = df[df[self.period] > self.last_period]
+        if df.empty:
+            return self
+        cube, periods = self._cube(df)
+        present = ~np.isnan(cube)
+        counts = present.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(present, cube, 0.0).sum(axis=1) / counts
+        unset = np.isnan(self.shift)
+        self.shift[unset] = means[unset]
+        x = np.where(present, cube - np.nan_to_num(self.shift)[:, None, :], 0.0)
+        mask = present.astype('float64')
+        # batched over regions: (r, k, t) @ (r, t, k)
+        self.n += mask.transpose(0, 2, 1) @ mask
+        self.sx += x.transpose(0, 2, 1) @ mask
+        self.sxx += (x * x).transpose(0, 2, 1) @ mask
+        self.sxy += x.transpose(0, 2, 1) @ x
+        self.last_period = periods.max() if self.last_period is None else max(self.last_period, periods.max())
+        # Swapped in whole, sessions sharing the service never see a partial dict
+        self._matrices = self._compute()
+        return self
+
+    def _compute(self):
+        n, sx, sxx, sxy = self.n, self.sx, self.sxx, self.sxy
+        sy = sx.transpose(0, 2, 1)
+        syy = sxx.transpose(0, 2, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = n * sxy - sx * sy
+            var_x = n * sxx - sx * sx
+            var_y = n * syy - sy * sy
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < 2) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        corr = np.clip(corr, -1, 1)
+        matrices = {}
+        for r in range(len(self.regions)):
+            observed = np.diag(n[r]) > 0
+            matrix = corr[r][np.ix_(observed, observed)]
+            matrix[np.diag_indices_from(matrix)] = np.where(np.isnan(np.diag(matrix)), np.nan, 1.0)
+            items = [item for item, seen in zip(self.items, observed) if seen]
+            order = np.argsort(items, kind='stable')
+            items = [items[i] for i in order]
+            matrices[self.regions[r]] = pd.DataFrame(
+                matrix[np.ix_(order, order)],
+                index=pd.Index(items, name=self.item),
+                columns=pd.Index(items, name=self.item)
+            )
+        return matrices
+
+    # Correlation matrix of the commodities priced in `region`
+    def matrix(self, region):
+        return self._matrices[region]
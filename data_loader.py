@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from animations import FrameStore
+from correlations import CorrelationService
+from data_store import open_partitioned, partition_months, query_dataset, read_store
+from filter_engine import FilterIndex
+from images import ImageIndex
+from price_changes import HISTORY_MONTHS, SERIES_KEYS, PriceChangeEngine
+from ranking import Ranking
+from risk import RiskEngine
+from summaries import CommoditySummary
+from rollups import build_rollups, summarize
+from snapshots import SnapshotEngine
+from volatility import VolatilityEngine
+
+# With copy on write every filtered or derived frame gets its own data on the
+# first write, so page code can never modify the shared cached frame by accident
+pd.set_option("mode.copy_on_write", True)
+
+# All 11 urban districts
+URBAN_DISTRICTS = ['Colombo', 'Gampaha', 'Kandy', 'Kalutara',
+                   'Galle', 'Matara', 'Negombo', 'Kurunegala',
+                   'Anuradhapura', 'Ratnapura', 'Badulla']
+
+AVG_MONTHLY_INCOME = 50000  # LKR, used for the regional affordability chart
+DAILY_WAGE = 500  # LKR, used for the days of wages in Insights
+
+
+# Every column the pages derive from the raw data is added here once, so page
+# code only ever reads from the frame
+def enrich_food(df):
+    df = df.copy()
+    start = df['Reference_Period_Start']
+    df['Year'] = start.dt.year.astype('int16')
+    df['Quarter'] = start.dt.to_period('Q').astype(str).astype('category')
+    df['Month'] = start.dt.strftime('%Y-%m').astype('category')
+    df['Price_Change'] = df.groupby(['Commodity_Name', 'Admin1_Name'], observed=True)['Price'].pct_change()
+    df['Type'] = pd.Categorical(
+        np.where(df['Admin2_Name'].isin(URBAN_DISTRICTS), 'Urban', 'Rural'),
+        categories=['Urban', 'Rural']
+    )
+    df['Price_to_Income_Ratio'] = df['Price'] / AVG_MONTHLY_INCOME * 100
+    df['days_wage'] = (df['Price'] / DAILY_WAGE) * 30
+    return df
+
+
+# One frame per process shared by every page and session. cache_resource hands
+# out the same object instead of unpickling a fresh copy on every call like
+# cache_data does, so treat the result as read only.
+@st.cache_resource(show_spinner="Loading food price data...")
+def load_food():
+    return enrich_food(read_store())
+
+
+@st.cache_resource
+def load_rollups():
+    return build_rollups(load_food())
+
+
+# Static top-N views of the dashboard, ranked once per process
+@st.cache_resource
+def load_rankings():
+    food = load_food()
+    rollups = load_rollups()
+    monthly = summarize(rollups['monthly'], ['Month', 'Commodity_Name'])['mean'].rename('Price').reset_index()
+    districts = summarize(rollups['district'], ['Admin2_Name'])['mean'].rename('Price').reset_index()
+    records = food['Provider_Admin2_Name'].value_counts().rename_axis('Provider_Admin2_Name').reset_index()
+    return {
+        'monthly_price': Ranking(monthly, 'Price', by='Month'),
+        'district_price': Ranking(districts, 'Price'),
+        'district_records': Ranking(records, 'count'),
+    }
+
+
+# Per frame data of the Animations page, grouped and rounded once per process.
+# The ranking race keeps the top 20 of every month, the most its slider shows.
+@st.cache_resource
+def load_animation_frames():
+    rollups = load_rollups()
+    quarterly = summarize(rollups['quarterly'], ['Quarter', 'Commodity_Name', 'Admin1_Name'])['mean'].rename('Price').reset_index()
+    race = load_rankings()['monthly_price'].top(20)
+    waves = load_food().dropna(subset=['Price_Change'])
+    return {
+        'price_bubbles': FrameStore(quarterly, 'Quarter', ['Commodity_Name', 'Admin1_Name', 'Price']),
+        'ranking_race': FrameStore(race, 'Month', ['Commodity_Name', 'Price', 'Rank']),
+        'price_change_waves': FrameStore(
+            waves, 'Month', ['Commodity_Category', 'Market_Name', 'Latitude', 'Longitude', 'Price_Change'],
+            decimals={'Latitude': 4, 'Longitude': 4, 'Price_Change': 4}
+        ),
+    }
+
+
+@st.cache_resource
+def load_snapshots():
+    return SnapshotEngine(load_food())
+
+
+# Price in effect at any time: each series' latest period that has started
+@st.cache_resource
+def load_price_history():
+    return SnapshotEngine(load_food(), time='Reference_Period_Start')
+
+
+@st.cache_resource
+def load_commodity_summary():
+    return CommoditySummary(load_food())
+
+
+@st.cache_resource
+def load_image_index():
+    return ImageIndex(load_food()['Commodity_Name'].dropna().unique().tolist())
+
+
+@st.cache_resource
+def load_filter_index():
+    return FilterIndex(load_food())
+
+
+# Month partitioned copy of the store for queries that only need a date range
+@st.cache_resource
+def load_partitioned():
+    return open_partitioned()
+
+
+# Built from the month partitions the lookback windows can reach, counted
+# back from the newest one, instead of the whole history
+@st.cache_resource
+def load_price_changes():
+    dataset = load_partitioned()
+    months = partition_months(dataset)
+    start = months[-1] - pd.DateOffset(months=HISTORY_MONTHS - 1) if months else None
+    return PriceChangeEngine(query_dataset(dataset, start=start, columns=SERIES_KEYS + ['Reference_Period_Start', 'Price']))
+
+
+@st.cache_resource
+def load_correlations():
+    return CorrelationService(load_food())
+
+
+@st.cache_resource
+def load_volatility():
+    return VolatilityEngine(load_food())
+
+
+@st.cache_resource
+def load_risk():
+    return RiskEngine(load_food())
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# The xlsx is the source of truth, the parquet file is a typed columnar copy of it
+XLSX_PATH = "cleaned_hdx_hapi_food_price_lka.xlsx"
+PARQUET_PATH = "cleaned_hdx_hapi_food_price_lka.parquet"
+
+# Same data split into year=/month= directories (optionally Admin1_Name= below
+# them) so date range queries only open the months they cover
+PARTITIONED_PATH = "cleaned_hdx_hapi_food_price_lka_partitioned"
+PARTITION_MARKER = "_source.json"
+PARTITION_BY_REGION = os.environ.get("DSPL_PARTITION_BY_REGION", "0") == "1"
+
+# Key under which the hash of the source xlsx is stored in the parquet metadata
+SOURCE_HASH_KEY = b"dspl_source_sha256"
+
+CATEGORY_COLUMNS = [
+    'Provider_Admin1_Name', 'Provider_Admin2_Name', 'Admin1_Name', 'Admin2_Name',
+    'Market_Name', 'Commodity_Category', 'Commodity_Name', 'Unit', 'Price_Type'
+]
+FLOAT32_COLUMNS = ['Price', 'Standardized_Price', 'Price_Mean', 'Price_Median', 'Price_Std']
+DATE_COLUMNS = ['Reference_Period_Start', 'Reference_Period_End']
+MONTH_COLUMNS = ['Start_Month', 'End_Month']
+
+# Column order of the cleaned dataset
+STORE_COLUMNS = [
+    'Provider_Admin1_Name', 'Provider_Admin2_Name', 'Admin1_Name', 'Admin2_Name', 'Market_Name',
+    'Latitude', 'Longitude', 'Commodity_Category', 'Commodity_Name', 'Unit', 'Price_Type', 'Price',
+    'Reference_Period_Start', 'Reference_Period_End', 'Standardized_Price', 'Start_Month', 'End_Month',
+    'Price_Mean', 'Price_Median', 'Price_Std'
+]
+
+
+def optimize_dtypes(df):
+    df = df.copy()
+    for col in DATE_COLUMNS:
+        if col in df:
+            df[col] = pd.to_datetime(df[col])
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    for col in FLOAT32_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('float32')
+    for col in MONTH_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('int8')
+    return df
+
+
+# Arrow schema matching optimize_dtypes, for writers that append the store in pieces
+def store_schema(columns=STORE_COLUMNS):
+    fields = []
+    for col in columns:
+        if col in CATEGORY_COLUMNS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        elif col in FLOAT32_COLUMNS:
+            fields.append(pa.field(col, pa.float32()))
+        elif col in DATE_COLUMNS:
+            fields.append(pa.field(col, pa.timestamp('ns')))
+        elif col in MONTH_COLUMNS:
+            fields.append(pa.field(col, pa.int8()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_store(df, source_hash, parquet_path=PARQUET_PATH):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_HASH_KEY] = source_hash.encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temp file first so concurrent workers never read a half written file
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, parquet_path)
+
+
+# Build step: parse the xlsx once and write it out as compressed, typed parquet
+def build_store(xlsx_path=XLSX_PATH, parquet_path=PARQUET_PATH):
+    df = optimize_dtypes(pd.read_excel(xlsx_path))
+    write_store(df, file_hash(xlsx_path), parquet_path)
+    return df
+
+
+def is_stale(xlsx_path=XLSX_PATH, parquet_path=PARQUET_PATH):
+    if not os.path.exists(parquet_path):
+        return True
+    if not os.path.exists(xlsx_path):
+        return False
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return True
+    return metadata.get(SOURCE_HASH_KEY) != file_hash(xlsx_path).encode()
+
+
+# Fast path reads the parquet file, the xlsx is only parsed when the parquet is missing or stale
+def read_store(xlsx_path=XLSX_PATH, parquet_path=PARQUET_PATH):
+    if not is_stale(xlsx_path, parquet_path):
+        return pd.read_parquet(parquet_path)
+    df = optimize_dtypes(pd.read_excel(xlsx_path))
+    try:
+        write_store(df, file_hash(xlsx_path), parquet_path)
+    except OSError:
+        # Read only deployments can still serve the data, just without the cache file
+        pass
+    return df
+
+
+def _partition_fields(by_region):
+    fields = [pa.field('year', pa.int16()), pa.field('month', pa.int8())]
+    if by_region:
+        fields.append(pa.field('Admin1_Name', pa.string()))
+    return fields
+
+
+# Partitions by the month of Reference_Period_Start
+def write_partitioned(df, source_hash, root=PARTITIONED_PATH, by_region=PARTITION_BY_REGION):
+    fields = _partition_fields(by_region)
+    start = df['Reference_Period_Start']
+    table = pa.Table.from_pandas(
+        df.assign(year=start.dt.year.astype('int16'), month=start.dt.month.astype('int8')),
+        preserve_index=False
+    )
+    # Build next to the old copy and swap directories, readers never see a half written dataset
+    tmp_root = f"{root}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    pq.write_to_dataset(table, tmp_root, partition_cols=[f.name for f in fields], compression='zstd')
+    with open(os.path.join(tmp_root, PARTITION_MARKER), 'w') as f:
+        json.dump({'source_sha256': source_hash, 'partition_cols': [f.name for f in fields]}, f)
+    old_root = f"{root}.{os.getpid()}.old"
+    if os.path.exists(root):
+        os.replace(root, old_root)
+    os.replace(tmp_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+
+
+def _partition_marker(root):
+    try:
+        with open(os.path.join(root, PARTITION_MARKER)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# Opens the partitioned dataset, rebuilding it from the store when it is
+# missing, built from an older xlsx or laid out differently
+def open_partitioned(xlsx_path=XLSX_PATH, root=PARTITIONED_PATH, by_region=PARTITION_BY_REGION):
+    fields = _partition_fields(by_region)
+    source_hash = file_hash(xlsx_path) if os.path.exists(xlsx_path) else None
+    marker = _partition_marker(root)
+    if (marker is None or marker['partition_cols'] != [f.name for f in fields]
+            or (source_hash is not None and marker['source_sha256'] != source_hash)):
+        df = read_store(xlsx_path)
+        try:
+            write_partitioned(df, source_hash, root, by_region)
+        except OSError:
+            # Read only deployments get a private copy in the temp dir
+            root = os.path.join(tempfile.mkdtemp(prefix='dspl-'), os.path.basename(root))
+            write_partitioned(df, source_hash, root, by_region)
+    return ds.dataset(root, format='parquet', partitioning=ds.partitioning(pa.schema(fields), flavor='hive'),
+                      exclude_invalid_files=False, ignore_prefixes=['_', '.'])
+
+
+def _month_bound(ts, upper):
+    year, month = ds.field('year'), ds.field('month')
+    if upper:
+        return (year < ts.year) | ((year == ts.year) & (month <= ts.month))
+    return (year > ts.year) | ((year == ts.year) & (month >= ts.month))
+
+
+# Filter expression for an inclusive Reference_Period_Start range and optional
+# region/commodity lists. The year/month terms only touch partition columns, so
+# arrow skips the directories outside the range without opening them.
+def partition_filter(start=None, end=None, regions=None, commodities=None):
+    terms = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        terms += [_month_bound(start, upper=False), ds.field('Reference_Period_Start') >= pa.scalar(start, pa.timestamp('ns'))]
+    if end is not None:
+        end = pd.Timestamp(end)
+        terms += [_month_bound(end, upper=True), ds.field('Reference_Period_Start') <= pa.scalar(end, pa.timestamp('ns'))]
+    if regions is not None:
+        terms.append(ds.field('Admin1_Name').isin(list(regions)))
+    if commodities is not None:
+        terms.append(ds.field('Commodity_Name').isin(list(commodities)))
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+
+# First day of every month the dataset holds, read from the partition
+# directories without opening any file
+def partition_months(dataset):
+    months = set()
+    for fragment in dataset.get_fragments():
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        months.add(pd.Timestamp(year=keys['year'], month=keys['month'], day=1))
+    return sorted(months)
+
+
+def query_dataset(dataset, start=None, end=None, regions=None, commodities=None, columns=None):
+    columns = columns or STORE_COLUMNS
+    table = dataset.to_table(columns=columns, filter=partition_filter(start, end, regions, commodities))
+    df = optimize_dtypes(table.to_pandas())
+    # Directories come back in path order (month=10 before month=2), put rows
+    # back in date order like the store
+    if 'Reference_Period_Start' in columns:
+        df = df.sort_values('Reference_Period_Start', kind='stable', ignore_index=True)
+    return df
+
+
+def query_store(start=None, end=None, regions=None, commodities=None, columns=None):
+    return query_dataset(open_partitioned(), start, end, regions, commodities, columns)
+
+
+if __name__ == "__main__":
+    df = build_store()
+    print(f"Wrote {len(df)} rows to {PARQUET_PATH}")
+    write_partitioned(df, file_hash(XLSX_PATH))
+    print(f"Wrote {len(df)} rows to {PARTITIONED_PATH}")
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Maximum number of points sent to the browser for a single trace
+POINT_BUDGET = int(os.environ.get("DSPL_POINT_BUDGET", 500))
+
+
+def _as_float(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy('datetime64[ns]').astype('int64').astype('float64')
+    return values.to_numpy(dtype='float64')
+
+
+# Largest-Triangle-Three-Buckets: keeps the first and last point and from every
+# bucket in between the point forming the largest triangle with its neighbours.
+# x must be sorted.
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[edges[i + 1]:edges[i + 2]].mean()
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+# Min/max bucketing keeps the envelope of the series, which is what an area chart shows.
+# x must be sorted.
+def minmax_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = np.arange(n) * (n_out // 2) // n
+    by_bucket = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([by_bucket.idxmin().to_numpy(), by_bucket.idxmax().to_numpy()]))
+
+
+# Evenly spaced order statistics plus every point outside the 1.5 IQR fences,
+# so a box drawn from the sample has the same shape as one drawn from all points
+def quantile_sample_indices(y, n_out):
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    order = np.argsort(y, kind='stable')
+    keep = order[np.linspace(0, n - 1, n_out).round().astype(np.int64)]
+    q1, q3 = np.quantile(y, [0.25, 0.75])
+    fence = 1.5 * (q3 - q1)
+    outliers = np.flatnonzero((y < q1 - fence) | (y > q3 + fence))
+    return np.unique(np.concatenate([keep, outliers]))
+
+
+def _per_trace(df, by, pick):
+    if df.empty:
+        return df
+    if by is None:
+        return pick(df)
+    parts = [pick(group) for _, group in df.groupby(by, observed=True, sort=False)]
+    return pd.concat(parts)
+
+
+# Thin a time series frame to at most `budget` points per trace (one trace per
+# `by` group) before handing it to plotly. method is 'lttb' for lines and
+# 'minmax' for areas.
+def downsample_series(df, x, y, by=None, budget=POINT_BUDGET, method='lttb'):
+    select = lttb_indices if method == 'lttb' else minmax_indices
+
+    def pick(group):
+        group = group.sort_values(x, kind='stable')
+        if len(group) <= budget:
+            return group
+        return group.iloc[select(_as_float(group[x]), _as_float(group[y]), budget)]
+
+    return _per_trace(df, by, pick)
+
+
+# Cap the raw points behind box/strip plots at `budget` per box
+def sample_points(df, y, by=None, budget=POINT_BUDGET):
+    def pick(group):
+        if len(group) <= budget:
+            return group
+        return group.iloc[quantile_sample_indices(_as_float(group[y]), budget)]
+
+    return _per_trace(df, by, pick)
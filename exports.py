@@ -0,0 +1,86 @@
+import gzip
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from figure_cache import LRUCache, figure_key
+
+# Download formats offered for the filtered data, label -> (extension, mime type)
+EXPORT_FORMATS = {
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Rows serialized at a time, so no format ever holds the whole file as text
+EXPORT_CHUNK_ROWS = 5000
+
+# Finished files are shared by every session like the figures, so the same
+# filter selection exported twice is only built once
+MAX_EXPORT_BYTES = int(os.environ.get("DSPL_EXPORT_CACHE_MB", 64)) * 1024 * 1024
+
+_exports = LRUCache(MAX_EXPORT_BYTES)
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv_gz(df, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    with gzip.GzipFile(fileobj=out, mode='wb') as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        df.head(0).to_csv(text, index=False)
+        for chunk in _chunks(df, chunk_rows):
+            chunk.to_csv(text, index=False, header=False)
+        text.flush()
+        text.detach()
+
+
+def write_parquet(df, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(out, schema, compression='zstd') as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+# openpyxl's write only mode streams rows to the sheet instead of keeping a
+# cell object for every value
+def write_xlsx(df, out, chunk_rows=EXPORT_CHUNK_ROWS):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Food Prices')
+    sheet.append([str(col) for col in df.columns])
+    single = df.columns[df.dtypes == 'float32']
+    for chunk in _chunks(df, chunk_rows):
+        # float32 through its shortest repr, so 549.33 is not written as 549.3300170898438
+        chunk = chunk.astype({col: str for col in single}).astype({col: 'float64' for col in single})
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+    workbook.save(out)
+
+
+WRITERS = {'csv.gz': write_csv_gz, 'parquet': write_parquet, 'xlsx': write_xlsx}
+
+
+# File contents of `df` in `extension` format. `params` has to identify the
+# rows of `df` (the filter selection), it is the cache key together with the format.
+def export_bytes(df, extension, params):
+    key = export_key(extension, params)
+    data = _exports.get(key)
+    if data is None:
+        out = io.BytesIO()
+        WRITERS[extension](df, out)
+        data = out.getvalue()
+        _exports.put(key, data)
+    return data
+
+
+def export_key(extension, params):
+    return figure_key('export', {**params, 'format': extension})
+
+
+def clear_export_cache():
+    _exports.clear()
@@ -0,0 +1,88 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Serialized figures are kept per process and shared by every session,
+# least recently used entries are dropped once the cap is reached
+MAX_CACHE_BYTES = int(os.environ.get("DSPL_FIGURE_CACHE_MB", 64)) * 1024 * 1024
+
+
+# Byte-capped LRU of serialized values, safe to share between sessions
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_figures = LRUCache(MAX_CACHE_BYTES)
+
+
+# Turn filter parameters into a stable JSON friendly form. Sets are sorted so
+# the same selection made in a different order maps to the same key, lists and
+# tuples keep their order.
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple, pd.Index, pd.Series, np.ndarray, pd.Categorical)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def figure_key(kind, params):
+    payload = json.dumps([kind, _normalize(params)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+# Return the figure for (kind, params), calling build() only on a cache miss.
+# Everything build() depends on has to be part of params.
+def cached_figure(kind, params, build):
+    key = figure_key(kind, params)
+    figure_json = _figures.get(key)
+    if figure_json is None:
+        figure_json = build().to_json()
+        _figures.put(key, figure_json)
+    # The JSON came from an already validated figure, so skip plotly's validation pass
+    return go.Figure(json.loads(figure_json), _validate=False)
+
+
+def clear_figure_cache():
+    _figures.clear()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Columns with a small set of repeated values get one sorted array of row
+# positions per value, continuous date columns get a sorted order for range lookups
+POSTING_COLUMNS = ['Admin1_Name', 'Commodity_Name', 'Commodity_Category', 'Price_Type', 'Year', 'Month']
+SORTED_COLUMNS = ['Reference_Period_Start', 'Reference_Period_End']
+
+
+class FilterIndex:
+    def __init__(self, df, posting_columns=POSTING_COLUMNS, sorted_columns=SORTED_COLUMNS):
+        self.df = df
+        self.postings = {}
+        for col in posting_columns:
+            indices = df.groupby(col, observed=True, sort=True).indices
+            self.postings[col] = {key: rows.astype(np.int64) for key, rows in indices.items()}
+        self.orders = {}
+        for col in sorted_columns:
+            order = np.argsort(df[col].to_numpy(), kind='stable')
+            self.orders[col] = (order, df[col].to_numpy()[order])
+
+    def _posting_rows(self, col, wanted):
+        postings = self.postings[col]
+        if isinstance(wanted, slice):
+            keys = [key for key in postings
+                    if (wanted.start is None or key >= wanted.start)
+                    and (wanted.stop is None or key <= wanted.stop)]
+        elif isinstance(wanted, (list, tuple, set, np.ndarray, pd.Index, pd.Series, range)):
+            keys = [key for key in set(wanted) if key in postings]
+        else:
+            keys = [wanted] if wanted in postings else []
+        if len(keys) == len(postings):
+            return None  # every value selected, the column doesn't restrict anything
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        # postings of different values never overlap so the union is a plain concat
+        return np.sort(np.concatenate([postings[key] for key in keys]))
+
+    def _range_rows(self, col, wanted):
+        order, values = self.orders[col]
+        lo = 0 if wanted.start is None else np.searchsorted(values, np.asarray(wanted.start, values.dtype), 'left')
+        hi = len(values) if wanted.stop is None else np.searchsorted(values, np.asarray(wanted.stop, values.dtype), 'right')
+        if lo == 0 and hi == len(values):
+            return None
+        return np.sort(order[lo:hi])
+
+    # Row positions matching every criterion. Criteria use the same forms as
+    # rollups.slice_cube: a slice is an inclusive range, a list keeps the listed
+    # values and a scalar is an exact match.
+    def rows(self, **criteria):
+        selections = []
+        for col, wanted in criteria.items():
+            if col in self.postings:
+                rows = self._posting_rows(col, wanted)
+            elif col in self.orders and isinstance(wanted, slice):
+                rows = self._range_rows(col, wanted)
+            else:
+                raise KeyError(f"No index for {col!r} with {type(wanted).__name__} criteria")
+            if rows is not None:
+                selections.append(rows)
+        if not selections:
+            return np.arange(len(self.df))
+        selections.sort(key=len)
+        result = selections[0]
+        for rows in selections[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def select(self, **criteria):
+        return self.df.take(self.rows(**criteria))
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import threading
+from difflib import get_close_matches
+from PIL import Image, ImageOps, features
+
+IMAGE_FOLDER = "Commodities"
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png"]
+
+# Thumbnails are written once per source file version and width, so a changed
+# image (new mtime) gets a new thumbnail and stale ones are simply never read
+THUMBNAIL_DIR = os.environ.get("DSPL_THUMBNAIL_DIR", ".thumbnails")
+THUMBNAIL_WIDTH = 480  # about twice the width the About page shows them at
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_QUALITY = 80
+
+
+def _clean(name, chars=" _-()"):
+    for char in chars:
+        name = name.replace(char, "")
+    return name.lower()
+
+
+# Every commodity's main image and additional images, matched once against a
+# single listing of the image folder. The main image is the file named exactly
+# like the commodity, otherwise the closest fuzzy match of the cleaned names,
+# additional images are the files whose name contains the commodity's name.
+class ImageIndex:
+    def __init__(self, commodities, folder=IMAGE_FOLDER, thumbnail_dir=THUMBNAIL_DIR):
+        self.folder = folder
+        self.thumbnail_dir = thumbnail_dir
+        self.available = os.path.isdir(folder)
+        files = sorted(f for f in os.listdir(folder) if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS) if self.available else []
+        by_clean_name = {}
+        for f in files:
+            by_clean_name.setdefault(_clean(f), f)
+        self.main = {}
+        self.additional = {}
+        for name in commodities:
+            self.main[name] = self._match(name, files, by_clean_name)
+            self.additional[name] = [
+                os.path.join(folder, f) for f in files
+                if name.lower().replace(" ", "") in f.lower().replace(" ", "")
+            ]
+        self._thumbnails = {}
+        self._lock = threading.Lock()
+
+    def _match(self, name, files, by_clean_name):
+        for ext in IMAGE_EXTENSIONS:
+            if f"{name}{ext}" in files:
+                return os.path.join(self.folder, f"{name}{ext}")
+        match = get_close_matches(_clean(name, " ()"), list(by_clean_name), n=1, cutoff=0.6)
+        return os.path.join(self.folder, by_clean_name[match[0]]) if match else None
+
+    # Resized and recompressed copy of `path`, read from the thumbnail folder
+    # when this version of the file was already converted
+    def thumbnail(self, path, width=THUMBNAIL_WIDTH):
+        mtime = os.path.getmtime(path)
+        key = (path, mtime, width)
+        with self._lock:
+            data = self._thumbnails.get(key)
+        if data is not None:
+            return data
+        digest = hashlib.sha1(f"{path}|{mtime}|{width}".encode()).hexdigest()
+        cached_path = os.path.join(self.thumbnail_dir, f"{digest}.{THUMBNAIL_FORMAT.lower()}")
+        if os.path.exists(cached_path):
+            with open(cached_path, "rb") as f:
+                data = f.read()
+        else:
+            data = _resize(path, width)
+            tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(self.thumbnail_dir, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, cached_path)
+            except OSError:
+                # Read only deployments still get the thumbnail, kept in memory only
+                pass
+        with self._lock:
+            self._thumbnails[key] = data
+        return data
+
+
+def _resize(path, width):
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        if THUMBNAIL_FORMAT == "JPEG" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB" if THUMBNAIL_FORMAT == "JPEG" else "RGBA")
+        out = io.BytesIO()
+        image.save(out, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_store import STORE_COLUMNS, optimize_dtypes, store_schema
+from pipeline import CHUNK_SIZE, RAW_CSV_PATH, RAW_DTYPES, clean_chunk, outlier_bounds, read_raw_chunks, remove_outliers
+from stats import KeySet, QuantileSketch, RunningMoments, update_group_moments
+
+# Incremental mode keeps the cleaned data as one parquet partition per update
+# plus the running aggregates needed to clean the next release, so a monthly
+# refresh only touches the rows it adds. The state file lists the partitions
+# of every finished update, only those are read.
+DATASET_DIR = "food_price_dataset"
+STATE_FILE = "_state.json"
+KEYS_FILE = "_keys.npy"
+STATS_FILE = "commodity_stats.parquet"
+
+STAT_COLUMNS = ['Price_Mean', 'Price_Median', 'Price_Std']
+PARTITION_COLUMNS = [col for col in STORE_COLUMNS if col not in STAT_COLUMNS]
+
+
+def load_state(dataset_dir=DATASET_DIR):
+    path = os.path.join(dataset_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    state['keys'] = np.load(os.path.join(dataset_dir, KEYS_FILE))
+    return state
+
+
+def _replace(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_state(dataset_dir, partitions, last_period_end, carry, moments, commodity_moments, sketches, keys):
+    state = {
+        'partitions': partitions,
+        'last_period_end': last_period_end.isoformat(),
+        'carry': None if carry is None else carry.iloc[0].to_dict(),
+        'moments': moments.to_dict(),
+        'commodity_moments': {name: m.to_dict() for name, m in commodity_moments.items()},
+        'commodity_sketches': {name: s.to_dict() for name, s in sketches.items()},
+    }
+
+    def write_keys(path):
+        with open(path, 'wb') as f:
+            np.save(f, keys)
+
+    def write_state(path):
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    # keys first, the state file is what marks the update as done
+    _replace(os.path.join(dataset_dir, KEYS_FILE), write_keys)
+    _replace(os.path.join(dataset_dir, STATE_FILE), write_state)
+
+
+def _write_commodity_stats(dataset_dir, commodity_moments, sketches):
+    names = sorted(commodity_moments)
+    stats = pd.DataFrame({
+        'Commodity_Name': names,
+        'Price_Mean': [commodity_moments[name].mean for name in names],
+        'Price_Median': [sketches[name].quantile(0.5) for name in names],
+        'Price_Std': [commodity_moments[name].std for name in names],
+    })
+    _replace(os.path.join(dataset_dir, STATS_FILE), lambda path: optimize_dtypes(stats).to_parquet(path, index=False))
+
+
+# Cleans the rows of `csv_path` that are newer than the last update and writes
+# them as a new partition. Global outlier bounds and the per-commodity mean,
+# std (Welford) and median (quantile sketch, within 1%) are updated from their
+# running aggregates. Rows already written keep the outlier decision made when
+# they were added.
+def update_dataset(csv_path=RAW_CSV_PATH, dataset_dir=DATASET_DIR, chunksize=CHUNK_SIZE):
+    os.makedirs(dataset_dir, exist_ok=True)
+    state = load_state(dataset_dir)
+    if state is None:
+        partitions = []
+        last_period_end = None
+        seen = KeySet()
+        carry = None
+        moments = RunningMoments()
+        commodity_moments, sketches = {}, {}
+    else:
+        partitions = state['partitions']
+        last_period_end = pd.Timestamp(state['last_period_end'])
+        seen = KeySet(state['keys'])
+        carry = None if state['carry'] is None else pd.DataFrame([state['carry']]).astype(RAW_DTYPES)
+        moments = RunningMoments.from_dict(state['moments'])
+        commodity_moments = {name: RunningMoments.from_dict(m) for name, m in state['commodity_moments'].items()}
+        sketches = {name: QuantileSketch.from_dict(s) for name, s in state['commodity_sketches'].items()}
+
+    new_parts = []
+    for chunk in read_raw_chunks(csv_path, chunksize):
+        if last_period_end is not None:
+            # Rows of the last period are re-read so late additions to it are
+            # picked up, the key index drops the ones already written
+            end = pd.to_datetime(chunk['reference_period_end'], errors='coerce')
+            chunk = chunk[end.isna() | (end >= last_period_end)]
+            if chunk.empty:
+                continue
+        chunk, seen, carry = clean_chunk(chunk, seen, carry)
+        if not chunk.empty:
+            moments.update(chunk['Standardized_Price'])
+            new_parts.append(chunk)
+    if not new_parts:
+        return 0, None
+
+    new = remove_outliers(pd.concat(new_parts, ignore_index=True), bounds=outlier_bounds(moments.mean, moments.std))
+    update_group_moments(commodity_moments, new['Standardized_Price'], new['Commodity_Name'])
+    for name, values in new.groupby('Commodity_Name')['Standardized_Price']:
+        sketches.setdefault(name, QuantileSketch()).add(values)
+
+    # Numbered after the updates already in the state file, so every update
+    # gets its own partition (late rows of the last period included) and
+    # re-running an interrupted update overwrites the partition it left behind
+    newest = new['Reference_Period_End'].max()
+    last_period_end = newest if last_period_end is None else max(last_period_end, newest)
+    partition_name = f"part-{len(partitions):05d}.parquet"
+    partition_path = os.path.join(dataset_dir, partition_name)
+    table = pa.Table.from_pandas(optimize_dtypes(new)[PARTITION_COLUMNS], schema=store_schema(PARTITION_COLUMNS), preserve_index=False)
+    _replace(partition_path, lambda path: pq.write_table(table, path, compression='zstd'))
+    _write_commodity_stats(dataset_dir, commodity_moments, sketches)
+    _save_state(dataset_dir, partitions + [partition_name], last_period_end, carry, moments, commodity_moments, sketches, seen.to_array())
+    return len(new), partition_path
+
+
+# All partitions of finished updates with the current per-commodity stats
+# joined back on, in the same layout as the batch output
+def read_dataset(dataset_dir=DATASET_DIR):
+    state = load_state(dataset_dir)
+    if state is None or not state['partitions']:
+        raise FileNotFoundError(f"No partitions in {dataset_dir}")
+    paths = [os.path.join(dataset_dir, name) for name in state['partitions']]
+    df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    stats = pd.read_parquet(os.path.join(dataset_dir, STATS_FILE)).set_index('Commodity_Name')
+    for col in STAT_COLUMNS:
+        df[col] = df['Commodity_Name'].astype(str).map(stats[col].rename(index=str))
+    return optimize_dtypes(df)[STORE_COLUMNS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append the new rows of an HDX release to the partitioned dataset")
+    parser.add_argument('csv_path', nargs='?', default=RAW_CSV_PATH)
+    parser.add_argument('--dataset', default=DATASET_DIR)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    rows, partition_path = update_dataset(args.csv_path, args.dataset, args.chunksize)
+    if partition_path is None:
+        print("No new rows")
+    else:
+        print(f"Wrote {rows} rows to {partition_path}")
+
+
+if __name__ == "__main__":
+    main()
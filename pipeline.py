@@ -0,0 +1,472 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_store import XLSX_PATH, PARQUET_PATH, STORE_COLUMNS, file_hash, optimize_dtypes, store_schema, write_store
+from stats import KeySet, QuantileSketch, RunningMoments, median_ranks, update_group_moments
+
+# Vectorized version of Data_Preprocessing_DSPL.ipynb, raw HDX csv in, cleaned xlsx out
+RAW_CSV_PATH = "hdx_hapi_food_price_lka (4).csv"
+
+RENAMED_COLUMNS = {
+    'provider_admin1_name': 'Provider_Admin1_Name',
+    'provider_admin2_name': 'Provider_Admin2_Name',
+    'admin1_name': 'Admin1_Name',
+    'admin2_name': 'Admin2_Name',
+    'market_name': 'Market_Name',
+    'lat': 'Latitude',
+    'lon': 'Longitude',
+    'commodity_category': 'Commodity_Category',
+    'commodity_name': 'Commodity_Name',
+    'unit': 'Unit',
+    'price_type': 'Price_Type',
+    'price': 'Price',
+    'reference_period_start': 'Reference_Period_Start',
+    'reference_period_end': 'Reference_Period_End'
+}
+DROPPED_COLUMNS = ['location_code', 'has_hrp', 'in_gho', 'admin1_code', 'admin2_code', 'admin_level', 'price_flag', 'currency_code']
+
+# Placeholder text some exports use instead of an empty cell
+MISSING_SENTINEL = 'nun'
+
+# Price divisor per unit marker, ML prices become prices per litre, KG and Unit stay as they are
+UNIT_DIVISORS = {'ML': 1000}
+
+OUTLIER_SIGMAS = 3
+
+# Streaming mode reads the csv this many rows at a time and writes parquet only.
+# It gets its own default output so read_store never mistakes it for a stale
+# copy of the xlsx.
+CHUNK_SIZE = 100_000
+STREAM_PARQUET_PATH = "cleaned_hdx_hapi_food_price_stream.parquet"
+# Parallel mode splits the raw rows by one of these columns
+PARTITION_KEYS = {'commodity': 'commodity_name', 'admin1': 'admin1_name'}
+PARTITIONED_OUTPUT_DIR = "cleaned_hdx_hapi_food_price_partitioned"
+RAW_DTYPES = {**dict.fromkeys(RENAMED_COLUMNS, 'str'), 'lat': 'float64', 'lon': 'float64'}
+
+COMMODITY_MAPPING = {
+    'Bananas': 'Vegetables and Fruits',
+    'Carrots': 'Vegetables and Fruits',
+    'Coconut': 'Vegetables and Fruits',
+    'Eggplants': 'Vegetables and Fruits',
+    'Onions (imported)': 'Vegetables and Fruits',
+    'Onions (red, local)': 'Vegetables and Fruits',
+    'Papaya': 'Vegetables and Fruits',
+    'Pineapples': 'Vegetables and Fruits',
+    'Pumpkin': 'Vegetables and Fruits',
+    'Snake gourd': 'Vegetables and Fruits',
+    'Tomatoes': 'Vegetables and Fruits',
+    'Potatoes (imported)': 'Cereals and Tubers',
+    'Potatoes (local)': 'Cereals and Tubers',
+    'Rice (medium grain)': 'Cereals and Tubers',
+    'Rice (white)': 'Cereals and Tubers',
+    'Eggs': 'Meat, Fish and Eggs',
+    'Fish (dry, sprats)': 'Meat, Fish and Eggs',
+    'Fish (goldstripe sardinella)': 'Meat, Fish and Eggs',
+    'Fish (sail fish)': 'Meat, Fish and Eggs',
+    'Fish (skipjack tuna)': 'Meat, Fish and Eggs',
+    'Fish (trenched sardinella)': 'Meat, Fish and Eggs',
+    'Fish (yellowfin tuna)': 'Meat, Fish and Eggs',
+    'Fish (jack)': 'Meat, Fish and Eggs',
+    'Meat (chicken, broiler)': 'Meat, Fish and Eggs',
+    'Meat (chicken, fresh)': 'Meat, Fish and Eggs',
+    'Beans': 'Pulses and Nuts',
+    'Beans (mung)': 'Pulses and Nuts',
+    'Cowpeas (whole, average)': 'Pulses and Nuts',
+    'Lentils': 'Pulses and Nuts',
+    'Oil (coconut)': 'Oil and Fats',
+    'Chili (red, dry raw)': 'Miscellaneous Food'
+}
+
+
+# Row 2 of the HDX export holds HXL hashtags (#adm1+name, ...) rather than data
+def read_raw(path=RAW_CSV_PATH):
+    return pd.read_csv(path, skiprows=[1])
+
+
+def clean_columns(df):
+    df = df.drop_duplicates()
+    if df.isna().to_numpy().any():
+        df = df.ffill().bfill()
+    df = df.rename(columns=RENAMED_COLUMNS)
+    return df.drop(columns=DROPPED_COLUMNS, errors='ignore')
+
+
+# Drops rows without a usable price or dates and rows where any text cell
+# contains the missing sentinel. Text columns repeat a few values many times,
+# so the substring check runs once per distinct value.
+def drop_missing(df):
+    df = df.assign(Price=pd.to_numeric(df['Price'], errors='coerce'))
+    df = df.dropna()
+    has_sentinel = np.zeros(len(df), dtype=bool)
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        codes, uniques = pd.factorize(df[col])
+        matches = pd.Index(uniques).astype(str).str.contains(MISSING_SENTINEL, regex=False)
+        has_sentinel |= np.asarray(matches)[codes]
+    return df[~has_sentinel]
+
+
+def standardize_units(df):
+    divisor = np.ones(len(df))
+    for marker, factor in UNIT_DIVISORS.items():
+        divisor[df['Unit'].str.contains(marker, regex=False).to_numpy()] = factor
+    return df.assign(Standardized_Price=df['Price'] / divisor)
+
+
+def add_dates(df):
+    start = pd.to_datetime(df['Reference_Period_Start'])
+    end = pd.to_datetime(df['Reference_Period_End'])
+    return df.assign(
+        Reference_Period_Start=start,
+        Reference_Period_End=end,
+        Start_Month=start.dt.month,
+        End_Month=end.dt.month
+    )
+
+
+def outlier_bounds(mean, std, sigmas=OUTLIER_SIGMAS):
+    return mean - sigmas * std, mean + sigmas * std
+
+
+# Keeps rows strictly within `sigmas` standard deviations of the column mean.
+# Pass bounds computed elsewhere to filter one chunk of a larger dataset.
+def remove_outliers(df, column='Standardized_Price', sigmas=OUTLIER_SIGMAS, bounds=None):
+    values = df[column]
+    low, high = bounds or outlier_bounds(values.mean(), values.std(), sigmas)
+    return df[(values < high) & (values > low)]
+
+
+def add_commodity_stats(df):
+    stats = df.groupby('Commodity_Name')['Standardized_Price'].agg(['mean', 'median', 'std'])
+    stats.columns = ['Price_Mean', 'Price_Median', 'Price_Std']
+    return df.join(stats, on='Commodity_Name')
+
+
+def map_categories(df, mapping=COMMODITY_MAPPING):
+    return df.assign(Commodity_Category=df['Commodity_Name'].map(mapping).fillna(df['Commodity_Category']))
+
+
+def clean(df):
+    df = clean_columns(df)
+    df = drop_missing(df)
+    df = standardize_units(df)
+    df = add_dates(df)
+    df = remove_outliers(df)
+    df = add_commodity_stats(df)
+    df = map_categories(df)
+    return df.reset_index(drop=True)
+
+
+def run_pipeline(csv_path=RAW_CSV_PATH, output_path=XLSX_PATH, parquet_path=PARQUET_PATH):
+    df = clean(read_raw(csv_path))
+    df.to_excel(output_path, index=False)
+    if parquet_path:
+        # Keep the typed parquet copy in step with the xlsx it was built from
+        write_store(optimize_dtypes(df), file_hash(output_path), parquet_path)
+    return df
+
+
+def read_raw_chunks(csv_path=RAW_CSV_PATH, chunksize=CHUNK_SIZE):
+    return pd.read_csv(csv_path, skiprows=[1], usecols=list(RENAMED_COLUMNS), dtype=RAW_DTYPES, chunksize=chunksize)
+
+
+# Drops raw rows already taken and fills gaps. `seen` is the KeySet of
+# hashes of raw rows already taken and `carry` the last raw row before this
+# chunk, both are returned updated for the next chunk. `seen` holds 8 bytes
+# per distinct row, the one part of streaming whose memory grows with the input.
+def dedupe_and_fill(chunk, seen, carry):
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    fresh = ~pd.Series(hashes).duplicated().to_numpy() & ~seen.contains(hashes)
+    chunk = chunk[fresh]
+    seen.add(hashes[fresh])
+    if chunk.isna().to_numpy().any():
+        # Gaps are filled from the last row before the chunk, only gaps at the
+        # very start of the data are back filled
+        chunk = chunk.ffill() if carry is None else pd.concat([carry, chunk]).ffill().iloc[1:]
+        chunk = chunk.bfill()
+    if not chunk.empty:
+        carry = chunk.iloc[[-1]]
+    return chunk, seen, carry
+
+
+# The cleaning steps that only look at one row at a time
+def clean_rows(raw):
+    df = raw.rename(columns=RENAMED_COLUMNS)
+    return map_categories(add_dates(standardize_units(drop_missing(df))))
+
+
+def clean_chunk(chunk, seen, carry):
+    chunk, seen, carry = dedupe_and_fill(chunk, seen, carry)
+    return clean_rows(chunk), seen, carry
+
+
+class _TableAppender:
+    def __init__(self, path, **options):
+        self.path = path
+        self.options = options
+        self.writer = None
+
+    def append(self, df, schema=None):
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, schema or table.schema, **self.options)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Streaming and parallel mode. Only duplicate removal, outlier bounds and
+# per-commodity stats need the whole dataset. Rows are cleaned row-locally into
+# staging parquet files while the global aggregates are accumulated, then the
+# staging files are re-read batch by batch. Every pass below works on one
+# staging file, the parallel mode runs them over its partitions in a process
+# pool and merges the results.
+def _staged_batches(staging_path, bounds, chunksize):
+    for batch in pq.ParquetFile(staging_path).iter_batches(batch_size=chunksize):
+        yield remove_outliers(batch.to_pandas(), bounds=bounds)
+
+
+def _file_moments(staging_path, chunksize=CHUNK_SIZE):
+    moments = RunningMoments()
+    for batch in pq.ParquetFile(staging_path).iter_batches(batch_size=chunksize, columns=['Standardized_Price']):
+        moments.update(batch.column(0).to_numpy())
+    return moments
+
+
+def _file_commodity_aggregates(staging_path, bounds, chunksize=CHUNK_SIZE):
+    moments, sketches = {}, {}
+    for df in _staged_batches(staging_path, bounds, chunksize):
+        update_group_moments(moments, df['Standardized_Price'], df['Commodity_Name'])
+        for name, values in df.groupby('Commodity_Name')['Standardized_Price']:
+            sketches.setdefault(name, QuantileSketch()).add(values)
+    return moments, sketches
+
+
+def _file_bucket_values(staging_path, bounds, bucket_keys, chunksize=CHUNK_SIZE):
+    sketch = QuantileSketch()
+    found = {}
+    for df in _staged_batches(staging_path, bounds, chunksize):
+        for name, values in df.groupby('Commodity_Name')['Standardized_Price']:
+            values = values.to_numpy()
+            found.setdefault(name, []).append(values[np.isin(sketch.keys(values), bucket_keys[name])])
+    return {name: np.concatenate(parts) for name, parts in found.items()}
+
+
+def _file_write_output(staging_path, bounds, stats, output_path, chunksize=CHUNK_SIZE):
+    rows = 0
+    schema = store_schema()
+    output = _TableAppender(output_path, compression='zstd')
+    try:
+        for df in _staged_batches(staging_path, bounds, chunksize):
+            names = df['Commodity_Name']
+            df = df.assign(**{col: names.map({name: s[i] for name, s in stats.items()})
+                              for i, col in enumerate(['Price_Mean', 'Price_Median', 'Price_Std'])})
+            output.append(optimize_dtypes(df)[STORE_COLUMNS], schema)
+            rows += len(df)
+    finally:
+        output.close()
+    return rows
+
+
+# Per-commodity mean and std from merged Welford moments, and an exact median
+# found in two passes: the merged sketch tells which bucket holds each middle
+# rank, the second pass keeps only the values falling in those buckets
+def _commodity_stats(staging_paths, bounds, chunksize, map_files=map):
+    moments, sketches = {}, {}
+    for file_moments, file_sketches in map_files(_file_commodity_aggregates, staging_paths, repeat(bounds), repeat(chunksize)):
+        for name, m in file_moments.items():
+            moments.setdefault(name, RunningMoments()).merge(m.count, m.mean, m.m2)
+        for name, sketch in file_sketches.items():
+            sketches.setdefault(name, QuantileSketch()).merge(sketch)
+
+    targets = {name: [(rank, *sketch.locate(rank)) for rank in median_ranks(sketch.count)]
+               for name, sketch in sketches.items()}
+    bucket_keys = {name: [key for _, key, _ in ranks] for name, ranks in targets.items()}
+    found = {}
+    for file_values in map_files(_file_bucket_values, staging_paths, repeat(bounds), repeat(bucket_keys), repeat(chunksize)):
+        for name, values in file_values.items():
+            found.setdefault(name, []).append(values)
+
+    stats = {}
+    for name, ranks in targets.items():
+        values = np.concatenate(found[name])
+        keys = sketches[name].keys(values)
+        middle = [np.sort(values[keys == key])[rank - below] for rank, key, below in ranks]
+        stats[name] = (moments[name].mean, float(np.mean(middle)), moments[name].std)
+    return stats
+
+
+def stream_pipeline(csv_path=RAW_CSV_PATH, parquet_path=STREAM_PARQUET_PATH, chunksize=CHUNK_SIZE):
+    staging_path = f"{parquet_path}.{os.getpid()}.staging"
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    try:
+        seen = KeySet()
+        carry = None
+        moments = RunningMoments()
+        staging = _TableAppender(staging_path)
+        try:
+            for chunk in read_raw_chunks(csv_path, chunksize):
+                chunk, seen, carry = clean_chunk(chunk, seen, carry)
+                if not chunk.empty:
+                    moments.update(chunk['Standardized_Price'])
+                    staging.append(chunk)
+        finally:
+            staging.close()
+        if moments.count == 0:
+            raise ValueError(f"No usable rows in {csv_path}")
+
+        bounds = outlier_bounds(moments.mean, moments.std)
+        stats = _commodity_stats([staging_path], bounds, chunksize)
+        rows = _file_write_output(staging_path, bounds, stats, tmp_path, chunksize)
+        os.replace(tmp_path, parquet_path)
+    finally:
+        for path in (staging_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return rows
+
+
+def _clean_partition(raw_path, staging_path, chunksize=CHUNK_SIZE):
+    staging = _TableAppender(staging_path)
+    try:
+        for batch in pq.ParquetFile(raw_path).iter_batches(batch_size=chunksize):
+            df = clean_rows(batch.to_pandas())
+            if not df.empty:
+                staging.append(df)
+    finally:
+        staging.close()
+    return _file_moments(staging_path, chunksize) if staging.writer is not None else RunningMoments()
+
+
+# Parallel mode. The main process parses the csv, drops duplicate rows and
+# fills gaps (both depend on file order) and splits the raw rows into one file
+# per value of `partition_by`. Cleaning, the per-commodity passes and writing
+# the output then run per partition in a process pool, with the global outlier
+# bounds and commodity stats merged from the partitions' aggregates. The output
+# is a directory with one parquet file per partition.
+def parallel_pipeline(csv_path=RAW_CSV_PATH, output_dir=PARTITIONED_OUTPUT_DIR, partition_by='commodity',
+                      workers=None, chunksize=CHUNK_SIZE):
+    key = PARTITION_KEYS[partition_by]
+    os.makedirs(output_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.staging-', dir=output_dir)
+    try:
+        seen = KeySet()
+        carry = None
+        raw_files = {}
+        try:
+            for chunk in read_raw_chunks(csv_path, chunksize):
+                chunk, seen, carry = dedupe_and_fill(chunk, seen, carry)
+                for value, rows in chunk.groupby(key, sort=False):
+                    if value not in raw_files:
+                        raw_files[value] = _TableAppender(os.path.join(work_dir, f"raw-{len(raw_files):05d}.parquet"))
+                    raw_files[value].append(rows)
+        finally:
+            for appender in raw_files.values():
+                appender.close()
+
+        raw_paths = [appender.path for appender in raw_files.values()]
+        staging_paths = [path.replace('raw-', 'clean-') for path in raw_paths]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            moments = RunningMoments()
+            for m in pool.map(_clean_partition, raw_paths, staging_paths, repeat(chunksize)):
+                moments.merge(m.count, m.mean, m.m2)
+            if moments.count == 0:
+                raise ValueError(f"No usable rows in {csv_path}")
+            staging_paths = [path for path in staging_paths if os.path.exists(path)]
+
+            bounds = outlier_bounds(moments.mean, moments.std)
+            stats = _commodity_stats(staging_paths, bounds, chunksize, map_files=pool.map)
+            output_paths = [os.path.join(output_dir, f"part-{i:05d}.parquet") for i in range(len(staging_paths))]
+            for path in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+                os.remove(path)
+            rows = sum(pool.map(_file_write_output, staging_paths, repeat(bounds), repeat(stats), output_paths, repeat(chunksize)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return rows
+
+
+# Row-wise steps exactly as the notebook runs them, kept only as the benchmark baseline
+def _notebook_convert_to_kg(row):
+    if 'ML' in row['Unit']:
+        return row['Price'] / 1000
+    return row['Price']
+
+
+def _notebook_clean(df):
+    df = df.drop_duplicates()
+    df = df.ffill().bfill()
+    df = df.rename(columns=RENAMED_COLUMNS).drop(columns=DROPPED_COLUMNS)
+    df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
+    df = df.dropna()
+    df = df[~df.apply(lambda row: row.astype(str).str.contains(MISSING_SENTINEL)).any(axis=1)]
+    df['Standardized_Price'] = df.apply(_notebook_convert_to_kg, axis=1)
+    df = add_dates(df)
+    df = remove_outliers(df)
+    for stat in ['mean', 'median', 'std']:
+        df[f'Price_{stat.capitalize()}'] = df.groupby('Commodity_Name')['Standardized_Price'].transform(stat)
+    df['Commodity_Category'] = df['Commodity_Name'].map(COMMODITY_MAPPING).fillna(df['Commodity_Category'])
+    return df.reset_index(drop=True)
+
+
+def _best_time(func, raw, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(raw)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def benchmark(csv_path=RAW_CSV_PATH, repeat=3):
+    raw = read_raw(csv_path)
+    rowwise_time, expected = _best_time(_notebook_clean, raw, repeat)
+    vectorized_time, result = _best_time(clean, raw, repeat)
+    pd.testing.assert_frame_equal(result, expected[result.columns], check_dtype=False)
+    print(f"{len(raw)} raw rows -> {len(result)} cleaned rows")
+    print(f"row-wise (notebook): {rowwise_time * 1000:8.1f} ms")
+    print(f"vectorized:          {vectorized_time * 1000:8.1f} ms  ({rowwise_time / vectorized_time:.1f}x faster)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the raw HDX food price export")
+    parser.add_argument('csv_path', nargs='?', default=RAW_CSV_PATH)
+    parser.add_argument('-o', '--output', default=XLSX_PATH, help="cleaned xlsx to write")
+    parser.add_argument('--parquet', default=None, help="typed parquet copy to write, empty to skip")
+    parser.add_argument('--stream', action='store_true', help="read the csv in chunks with bounded memory and write parquet only")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--parallel', action='store_true', help="process partitions in a process pool, writes a directory of parquet files")
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_KEYS), default='commodity')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to the number of cores")
+    parser.add_argument('--output-dir', default=PARTITIONED_OUTPUT_DIR)
+    parser.add_argument('--benchmark', action='store_true', help="time against the notebook's row-wise steps instead of writing output")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.csv_path, args.repeat)
+        return
+    if args.parallel:
+        rows = parallel_pipeline(args.csv_path, args.output_dir, args.partition_by, args.workers, args.chunksize)
+        print(f"Wrote {rows} rows to {args.output_dir}")
+        return
+    if args.stream:
+        parquet_path = args.parquet or STREAM_PARQUET_PATH
+        rows = stream_pipeline(args.csv_path, parquet_path, args.chunksize)
+        print(f"Wrote {rows} rows to {parquet_path}")
+        return
+    df = run_pipeline(args.csv_path, args.output, PARQUET_PATH if args.parquet is None else args.parquet)
+    print(f"Wrote {len(df)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
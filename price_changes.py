@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from ranking import Ranking
+
+# Lookback windows offered for price alerts, in months
+WINDOWS = [1, 3, 6, 12]
+
+# Months of history the windows can reach, the latest month included: the
+# base price of a window may be at most one window older than its start
+HISTORY_MONTHS = 2 * max(WINDOWS)
+
+# One price series per commodity sold in a market in a given unit and price
+# type, so changes never compare a retail kilo in Colombo with a wholesale one elsewhere
+SERIES_KEYS = ['Commodity_Name', 'Market_Name', 'Unit', 'Price_Type']
+
+
+def month_number(dates):
+    dates = pd.DatetimeIndex(dates)
+    return dates.year.to_numpy(np.int64) * 12 + dates.month.to_numpy(np.int64) - 1
+
+
+# Monthly average price per series, sorted by series then month, so the first
+# and last observation of any window is found with two binary searches per
+# series instead of a groupby over the raw rows
+class PriceChangeEngine:
+    def __init__(self, df, value='Price'):
+        monthly = (df.assign(_month=month_number(df['Reference_Period_Start']))
+                     .groupby(SERIES_KEYS + ['_month'], observed=True, sort=True)[value].mean())
+        series_index = monthly.index.droplevel('_month')
+        codes, uniques = pd.factorize(series_index)
+        self.series = uniques.to_frame(index=False, name=SERIES_KEYS)
+        self.codes = codes.astype(np.int64)
+        self.months = monthly.index.get_level_values('_month').to_numpy(np.int64)
+        self.prices = monthly.to_numpy('float64')
+        self.latest_month = int(self.months.max()) if len(self.months) else None
+        self.latest_date = None if self.latest_month is None else _month_start(np.array([self.latest_month]))[0]
+        # (series, month) packed into one sorted key
+        self._stride = int(self.months.max()) + 1 if len(self.months) else 1
+        self._sorted_keys = self.codes * self._stride + self.months
+        self._rankings = {}
+
+    # Change over `window` months ending at `as_of` (default: latest month in
+    # the data): the latest price inside the window against the last price at
+    # or before its start, which may be at most one window older. One row per
+    # series that has both.
+    def changes(self, window, as_of=None):
+        end = self.latest_month if as_of is None else int(month_number([as_of])[0])
+        columns = SERIES_KEYS + ['base_month', 'last_month', 'base_price', 'last_price', 'change']
+        if end is None:
+            return pd.DataFrame(columns=columns)
+        codes = np.arange(len(self.series), dtype=np.int64)
+        last = self._last_at_or_before(codes, end)
+        base = self._last_at_or_before(codes, end - window)
+        valid = ((last >= 0) & (base >= 0) & (self.codes[last] == codes) & (self.codes[base] == codes)
+                 & (self.months[last] > end - window) & (self.months[base] > end - 2 * window))
+        codes, last, base = codes[valid], last[valid], base[valid]
+
+        result = self.series.iloc[codes].reset_index(drop=True)
+        result['base_month'] = _month_start(self.months[base])
+        result['last_month'] = _month_start(self.months[last])
+        result['base_price'] = self.prices[base]
+        result['last_price'] = self.prices[last]
+        result['change'] = (result['last_price'] - result['base_price']) / result['base_price'] * 100
+        return result[columns]
+
+    # Position of each series' last month <= `month`, -1 when there is none at all
+    def _last_at_or_before(self, codes, month):
+        month = min(month, self._stride - 1)
+        if month < 0:
+            return np.full(len(codes), -1)
+        return np.searchsorted(self._sorted_keys, codes * self._stride + month, 'right') - 1
+
+    # Largest increases, ranked once per window and month so a new commodity
+    # selection or n only filters the ranking
+    def top_increases(self, window, as_of=None, n=5, commodities=None):
+        key = (window, self.latest_month if as_of is None else int(month_number([as_of])[0]))
+        if key not in self._rankings:
+            self._rankings[key] = Ranking(self.changes(window, as_of), 'change')
+        return self._rankings[key].top(n, Commodity_Name=commodities).drop(columns='Rank')
+
+
+def _month_start(months):
+    return pd.to_datetime({'year': months // 12, 'month': months % 12 + 1, 'day': 1})
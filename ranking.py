@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+
+# Rows sorted once by group then value (largest first unless `ascending`),
+# with each row's 1 based rank inside its group. A top-N view of any N is then
+# a filter on the rank instead of an nlargest per group, and rows with a
+# missing value are left out as nlargest does.
+class Ranking:
+    def __init__(self, df, value, by=None, ascending=False):
+        self.value = value
+        self.keys = [] if by is None else [by] if isinstance(by, str) else list(by)
+        ranked = df[df[value].notna()].sort_values(
+            self.keys + [value], ascending=[True] * len(self.keys) + [ascending], kind='stable'
+        ).reset_index(drop=True)
+        ranked['Rank'] = _ranks(ranked, self.keys)
+        self.ranked = ranked
+
+    # The first `n` rows of every group, optionally only among the rows whose
+    # columns are in the given values. Filtered rows are re-ranked in the
+    # stored order, which needs no new sort.
+    def top(self, n, **filters):
+        ranked = self.ranked
+        mask = np.ones(len(ranked), dtype=bool)
+        for col, wanted in filters.items():
+            if wanted is not None:
+                mask &= ranked[col].isin(list(wanted)).to_numpy()
+        if not mask.all():
+            ranked = ranked[mask].reset_index(drop=True)
+            ranked['Rank'] = _ranks(ranked, self.keys)
+        return ranked[ranked['Rank'] <= n].reset_index(drop=True)
+
+
+# Position of each row in its group, for rows already sorted by `keys`
+def _ranks(sorted_df, keys):
+    positions = np.arange(len(sorted_df))
+    if not keys or not len(sorted_df):
+        return positions + 1
+    starts = np.zeros(len(sorted_df), dtype=bool)
+    starts[0] = True
+    for key in keys:
+        codes = pd.factorize(sorted_df[key])[0]
+        starts[1:] |= codes[1:] != codes[:-1]
+    group_start = np.maximum.accumulate(np.where(starts, positions, 0))
+    return positions - group_start + 1
@@ -0,0 +1,64 @@
+import pandas as pd
+from rollups import build_cube
+
+# Admin levels risk is scored at, finest first. Markets sit in one district
+# and districts in one province, so the coarser levels roll up from markets.
+RISK_LEVELS = ['Market_Name', 'Admin2_Name', 'Admin1_Name']
+
+FOOD_SHARE = 0.3  # UN's 30% threshold for the share of income spent on food
+DAYS_PER_MONTH = 30
+
+
+# Average price of every commodity in every market, district and province,
+# rolled up from one count/sum cube at market grain so each level's average
+# still matches a groupby over the raw rows. Scores are a division of those
+# tables by the monthly food budget, so changing the wage, the food share or
+# the commodity selection never goes back to the rows.
+class RiskEngine:
+    def __init__(self, df, value='Price'):
+        base = build_cube(df, RISK_LEVELS[::-1] + ['Commodity_Name'], value)
+        keys = base.index.to_frame(index=False)
+        self.commodities = sorted(keys['Commodity_Name'].astype(str).unique().tolist())
+        self.prices = {}
+        self.provinces = {}
+        for level in RISK_LEVELS:
+            totals = base.groupby(level=[level, 'Commodity_Name'], observed=True)[['count', 'sum']].sum()
+            totals = totals[totals['count'] > 0]
+            table = (totals['sum'] / totals['count']).unstack('Commodity_Name')
+            table.columns = table.columns.astype(str)
+            table.index = table.index.astype(str)
+            self.prices[level] = table.reindex(columns=self.commodities).dropna(how='all')
+            first = keys.drop_duplicates(level)
+            provinces = pd.Series(first['Admin1_Name'].astype(str).to_numpy(), index=first[level].astype(str))
+            self.provinces[level] = provinces.reindex(self.prices[level].index)
+
+    # Share of the monthly food budget (daily_wage * 30 * food_share) a region
+    # needs: the mean over the selected commodities of price / budget, or with
+    # a `basket` of monthly quantities per commodity the cost of that basket
+    # over the budget. A basket can also be given per province as
+    # {province: {commodity: quantity}}, markets and districts use their
+    # province's basket and regions without one are left out.
+    def scores(self, level, daily_wage, food_share=FOOD_SHARE, commodities=None, basket=None):
+        prices = self.prices[level]
+        if commodities is not None:
+            wanted = set(map(str, commodities))
+            prices = prices[[name for name in self.commodities if name in wanted]]
+        budget = daily_wage * DAYS_PER_MONTH * food_share
+        if basket is None:
+            risk = prices.mean(axis=1) / budget
+        else:
+            cost = (prices * self._quantities(level, basket, prices)).sum(axis=1, min_count=1)
+            risk = cost / budget
+        return risk.dropna().rename_axis(level).rename('Risk %')
+
+    def _quantities(self, level, basket, prices):
+        if basket and all(isinstance(items, dict) for items in basket.values()):
+            table = pd.DataFrame.from_dict(basket, orient='index').reindex(columns=prices.columns)
+            return table.reindex(self.provinces[level]).set_axis(prices.index)
+        return pd.Series(basket, dtype='float64').reindex(prices.columns)
+
+    # Regions with the highest risk, capped at 100%
+    def top(self, level, daily_wage, food_share=FOOD_SHARE, commodities=None, basket=None, n=5):
+        risk = self.scores(level, daily_wage, food_share, commodities, basket)
+        return risk.nlargest(n).clip(0, 1).to_frame()
+
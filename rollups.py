@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+# Each cube keeps count, sum and sum of squares of one value column per key
+# combination. Those three add up across any subset of keys, so means, standard
+# deviations and coefficients of variation for a filtered view can be rebuilt
+# from the cube without going back to the raw rows.
+CUBES = {
+    'quarterly': (['Quarter', 'Commodity_Name', 'Admin1_Name'], 'Price'),
+    'monthly': (['Month', 'Commodity_Name'], 'Price'),
+    'region_category': (['Year', 'Admin1_Name', 'Commodity_Name', 'Commodity_Category'], 'Standardized_Price'),
+    'market_category': (['Year', 'Admin1_Name', 'Commodity_Name', 'Market_Name', 'Commodity_Category'], 'Price'),
+    'yearly': (['Year'], 'Price'),
+    'district': (['Admin2_Name'], 'Price'),
+}
+
+
+def build_cube(df, keys, value):
+    values = df[value].astype('float64')
+    parts = df[keys].assign(_value=values, _square=values * values)
+    return parts.groupby(keys, observed=True).agg(
+        count=('_value', 'count'),
+        sum=('_value', 'sum'),
+        sumsq=('_square', 'sum'),
+    )
+
+
+def build_rollups(df):
+    return {name: build_cube(df, keys, value) for name, (keys, value) in CUBES.items()}
+
+
+# Filters are keyed by level name. A slice keeps an inclusive range like .loc,
+# a list/set/array keeps the listed values and anything else is an exact match.
+def slice_cube(cube, **filters):
+    mask = np.ones(len(cube), dtype=bool)
+    for level, wanted in filters.items():
+        values = cube.index.get_level_values(level)
+        if isinstance(wanted, slice):
+            if wanted.start is not None:
+                mask &= values >= wanted.start
+            if wanted.stop is not None:
+                mask &= values <= wanted.stop
+        elif isinstance(wanted, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            mask &= values.isin(list(wanted))
+        else:
+            mask &= values == wanted
+    return cube[mask]
+
+
+# Re-aggregate a (sliced) cube to the given levels and derive the statistics
+def summarize(cube, by):
+    totals = cube.groupby(level=by, observed=True)[['count', 'sum', 'sumsq']].sum()
+    count = totals['count']
+    mean = totals['sum'] / count
+    # sample variance (ddof=1) so the numbers match pandas .std()
+    variance = (totals['sumsq'] - totals['sum'] * mean) / (count - 1)
+    totals['mean'] = mean
+    totals['std'] = np.sqrt(variance.clip(lower=0)).where(count > 1)
+    totals['cv'] = totals['std'] / mean
+    return totals
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# One price series per commodity, market and price type
+SNAPSHOT_KEYS = ['Commodity_Name', 'Market_Name', 'Price_Type']
+
+DAY = np.timedelta64(1, 'D')
+
+
+# Row positions sorted by series then by `time` (days), packed into one sorted
+# key, so the last observation of every series at or before any date is one
+# binary search per series. A price counts as known once its period has ended,
+# hence the default time column. Queries return whole rows of the original
+# frame with their original index, never values stitched from several rows.
+class SnapshotEngine:
+    def __init__(self, df, keys=SNAPSHOT_KEYS, time='Reference_Period_End'):
+        self.keys = list(keys)
+        self.time = time
+        self.rows = df
+        codes = df.groupby(self.keys, observed=True, sort=False).ngroup().to_numpy(np.int64)
+        days = (df[time].to_numpy('datetime64[D]') - np.datetime64(0, 'D')) // DAY
+        valid = codes >= 0
+        order = np.flatnonzero(valid)[np.lexsort((days[valid], codes[valid]))]
+        self._order = order
+        self._codes = codes[order]
+        self._days = days[order].astype(np.int64)
+        self.series_count = int(codes.max()) + 1 if valid.any() else 0
+        self._first_day = int(self._days.min()) if len(order) else 0
+        self._stride = int(self._days.max()) - self._first_day + 2 if len(order) else 1
+        self._sorted_keys = self._codes * self._stride + (self._days - self._first_day)
+
+    def _day(self, times):
+        days = (pd.DatetimeIndex(times).to_numpy('datetime64[D]') - np.datetime64(0, 'D')) // DAY
+        return np.minimum(days.astype(np.int64) - self._first_day, self._stride - 2)
+
+    # Position (into the sorted rows) of each series' last observation at or
+    # before the matching day, the first of them when several share that day.
+    # -1 when the series has none yet.
+    def _positions_at(self, codes, days):
+        keys = codes * self._stride + np.maximum(days, 0)
+        last = np.searchsorted(self._sorted_keys, keys, 'right') - 1
+        valid = (days >= 0) & (last >= 0) & (self._codes[np.maximum(last, 0)] == codes)
+        first = np.searchsorted(self._sorted_keys, self._sorted_keys[np.maximum(last, 0)], 'left')
+        return np.where(valid, first, -1)
+
+    def _positions(self, as_of=None):
+        codes = np.arange(self.series_count, dtype=np.int64)
+        day = self._stride - 2 if as_of is None else int(self._day([as_of])[0])
+        return self._positions_at(codes, np.full(len(codes), day))
+
+    # Latest row of every series as of a date (default: all data), optionally
+    # only rows whose columns match `filters` (list -> any of, slice -> range,
+    # scalar -> equal). Not cached: it is one binary search per series, and a
+    # cache keyed on user chosen dates would grow with every date picked.
+    def snapshot(self, as_of=None, **filters):
+        positions = self._positions(as_of)
+        rows = self.rows.iloc[np.sort(self._order[positions[positions >= 0]])]
+        return rows[_mask(rows, filters)]
+
+    # Row in effect for every series at every one of `times` (merge_asof
+    # style, one binary search per pair), with the time asked for as As_Of.
+    # With `until` a row only counts while that column is not before the time,
+    # e.g. until='Reference_Period_End' drops prices whose period has ended.
+    def prices_at(self, times, until=None, **filters):
+        times = pd.DatetimeIndex(np.atleast_1d(times))
+        codes = np.repeat(np.arange(self.series_count, dtype=np.int64), len(times))
+        days = np.tile(self._day(times), self.series_count)
+        positions = self._positions_at(codes, days)
+        found = positions >= 0
+        rows = self.rows.iloc[self._order[positions[found]]].assign(
+            As_Of=np.tile(times.to_numpy(), self.series_count)[found]
+        )
+        if until is not None:
+            rows = rows[(rows[until] >= rows['As_Of']).to_numpy()]
+        return rows[_mask(rows, filters)]
+
+    # Newest snapshot row per `by` group (or the single newest row when `by` is
+    # None), ties going to the row that comes first in the original frame
+    def latest(self, by=None, as_of=None, **filters):
+        rows = self.snapshot(as_of, **filters)
+        newest_first = rows.iloc[np.lexsort((np.arange(len(rows)), -rows[self.time].to_numpy('datetime64[ns]').astype(np.int64)))]
+        if by is None:
+            return newest_first.head(1)
+        return newest_first.drop_duplicates(by)
+
+
+def _mask(rows, filters):
+    mask = np.ones(len(rows), dtype=bool)
+    for col, wanted in filters.items():
+        if wanted is None:
+            continue
+        values = rows[col]
+        if isinstance(wanted, slice):
+            if wanted.start is not None:
+                mask &= (values >= wanted.start).to_numpy()
+            if wanted.stop is not None:
+                mask &= (values <= wanted.stop).to_numpy()
+        elif isinstance(wanted, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            mask &= values.isin(list(wanted)).to_numpy()
+        else:
+            mask &= (values == wanted).to_numpy()
+    return mask
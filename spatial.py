@@ -0,0 +1,50 @@
+import numpy as np
+
+# Grid cells are sized to cover this many screen pixels at the chosen zoom,
+# a 256 pixel map tile spans 360 / 2**zoom degrees of longitude
+CELL_PIXELS = 32
+KM_PER_DEGREE = 111
+
+
+def cell_degrees(zoom, pixels=CELL_PIXELS):
+    return 360 / 2 ** zoom * pixels / 256
+
+
+# One row per map marker instead of per record. Records are grouped by their
+# exact coordinate (a market) or, with `cell` in degrees, by the grid cell they
+# fall in, plus `keys` so markers of different commodities or units never
+# merge. Each marker sits at the mean coordinate of its records and carries
+# their count, the mean, min and max of `value`, the first value of every
+# column in `first` and the number of distinct values of every column in
+# `distinct` (as <column>_Count).
+def aggregate_points(df, keys, value='Price', cell=None, first=(), distinct=()):
+    lat = df['Latitude'].to_numpy('float64')
+    lon = df['Longitude'].to_numpy('float64')
+    if cell is None:
+        cell_lat, cell_lon = lat, lon
+    else:
+        cell_lat, cell_lon = np.floor(lat / cell), np.floor(lon / cell)
+    columns = list(dict.fromkeys(list(keys) + list(first) + list(distinct)))
+    parts = df[columns].assign(
+        _cell_lat=cell_lat, _cell_lon=cell_lon, _lat=lat, _lon=lon,
+        _value=df[value].astype('float64')
+    )
+    markers = parts.groupby(['_cell_lat', '_cell_lon'] + list(keys), observed=True, sort=False).agg(
+        Latitude=('_lat', 'mean'),
+        Longitude=('_lon', 'mean'),
+        Records=('_value', 'count'),
+        **{value: ('_value', 'mean'), f'{value}_Min': ('_value', 'min'), f'{value}_Max': ('_value', 'max')},
+        **{col: (col, 'first') for col in first if col not in keys},
+        **{f'{col}_Count': (col, 'nunique') for col in distinct}
+    )
+    return markers.reset_index(level=list(keys)).reset_index(drop=True)
+
+
+# Marker grouping choices offered next to a map, label -> cell size in degrees
+# (None groups by market coordinate)
+def grouping_options(zooms=(8, 6)):
+    options = {'Market': None}
+    for zoom in zooms:
+        size = cell_degrees(zoom)
+        options[f'~{size * KM_PER_DEGREE:.0f} km cells'] = size
+    return options
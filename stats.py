@@ -0,0 +1,165 @@
+import math
+import numpy as np
+import pandas as pd
+
+
+# Count, mean and sum of squared deviations kept with Welford's update, so
+# chunks can be folded in one at a time and partial results merged (Chan et al.)
+class RunningMoments:
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def merge(self, count, mean, m2):
+        if count == 0:
+            return self
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        return self
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        mean = values.mean()
+        return self.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['count'], state['mean'], state['m2'])
+
+
+# One RunningMoments per group, updated from a chunk with a single groupby
+def update_group_moments(moments, values, keys):
+    grouped = pd.Series(np.asarray(values, dtype='float64')).groupby(np.asarray(keys), sort=False)
+    for key, count, mean, var in grouped.agg(['count', 'mean', 'var']).itertuples():
+        if count:
+            m2 = var * (count - 1) if count > 1 else 0.0
+            moments.setdefault(key, RunningMoments()).merge(int(count), float(mean), float(m2))
+    return moments
+
+
+# Log bucketed quantile sketch (DDSketch style). Every value lands in a bucket
+# whose bounds are within `relative_accuracy` of each other, bucket counts are
+# additive so sketches of separate chunks merge by summing them. Zero has its
+# own bucket and negative values mirror the positive ones, so bucket keys sort
+# in the same order as the values they hold.
+class QuantileSketch:
+    KEY_OFFSET = 1 << 20
+
+    def __init__(self, relative_accuracy=0.01, counts=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.counts = dict(counts or {})
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def keys(self, values):
+        values = np.asarray(values, dtype='float64')
+        magnitude = np.abs(values)
+        with np.errstate(divide='ignore'):
+            index = np.ceil(np.log(np.where(magnitude > 0, magnitude, 1)) / math.log(self.gamma)).astype(np.int64)
+        index += self.KEY_OFFSET
+        return np.where(magnitude > 0, np.sign(values).astype(np.int64) * index, 0)
+
+    def add(self, values):
+        values = np.asarray(values, dtype='float64')
+        keys, counts = np.unique(self.keys(values[~np.isnan(values)]), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    # Bucket holding the value of 0 based `rank`, and how many values sit in lower buckets
+    def locate(self, rank):
+        below = 0
+        for key in sorted(self.counts):
+            if rank < below + self.counts[key]:
+                return key, below
+            below += self.counts[key]
+        raise IndexError(rank)
+
+    def value(self, key):
+        if key == 0:
+            return 0.0
+        index = abs(key) - self.KEY_OFFSET
+        # midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+        magnitude = 2 * self.gamma ** index / (self.gamma + 1)
+        return math.copysign(magnitude, key)
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return float('nan')
+        key, _ = self.locate(int(q * (total - 1)))
+        return self.value(key)
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'counts': {str(k): v for k, v in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['relative_accuracy'], {int(k): v for k, v in state['counts'].items()})
+
+
+# Set of 64-bit keys kept as sorted runs. Each add becomes a new run, and runs
+# no bigger than it are merged into it first, so there are at most log2(n)
+# runs and every key is re-sorted O(log n) times in total instead of the whole
+# set being re-sorted on every add. Memory is 8 bytes per key, it grows with
+# the number of keys added.
+class KeySet:
+    def __init__(self, keys=None):
+        self.runs = []
+        if keys is not None and len(keys):
+            self.runs.append(np.sort(np.asarray(keys, dtype=np.uint64)))
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, keys):
+        keys = np.asarray(keys, dtype=np.uint64)
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[positions] == keys
+        return found
+
+    def add(self, keys):
+        run = np.sort(np.asarray(keys, dtype=np.uint64))
+        if not len(run):
+            return self
+        while self.runs and len(self.runs[-1]) <= len(run):
+            # two sorted runs, which the stable sort handles in close to linear time
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='stable')
+        self.runs.append(run)
+        return self
+
+    def to_array(self):
+        return np.sort(np.concatenate(self.runs)) if self.runs else np.empty(0, dtype=np.uint64)
+
+
+# Ranks that a median of `count` values averages, as in pandas' median
+def median_ranks(count):
+    return (count - 1) // 2, count // 2
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Levels the About page looks commodities up at
+SUMMARY_LEVELS = {
+    'commodity': ['Commodity_Name'],
+    'commodity_unit': ['Commodity_Name', 'Unit'],
+    'series': ['Admin1_Name', 'Commodity_Name', 'Unit'],
+}
+
+
+# Rows sorted by Reference_Period_Start once, then for every key of every
+# level the price count/mean/min/max, the position of its latest record and
+# the positions of its rows in date order. A selection on the About page is a
+# dictionary lookup plus an iloc of its own rows.
+class CommoditySummary:
+    def __init__(self, df):
+        self.rows = df.sort_values('Reference_Period_Start', kind='stable', ignore_index=True)
+        self.tables = {}
+        self._positions = {}
+        for level, keys in SUMMARY_LEVELS.items():
+            grouped = self.rows.groupby(keys, observed=True)
+            table = grouped['Price'].agg(['count', 'mean', 'min', 'max'])
+            table['latest'] = grouped['Reference_Period_Start'].idxmax()
+            self.tables[level] = table
+            self._positions[level] = {
+                key if isinstance(key, tuple) else (key,): positions
+                for key, positions in grouped.indices.items()
+            }
+
+    # Summary of one key as a dict (count, mean, min, max, latest), None when
+    # the key has no rows. Values keep their column's dtype, so prices print
+    # as float32 like the rows they come from.
+    def stats(self, level, *key):
+        table = self.tables[level]
+        key = key[0] if len(key) == 1 else key
+        if key not in table.index:
+            return None
+        position = table.index.get_loc(key)
+        return {col: table[col].iloc[position] for col in table.columns}
+
+    def latest(self, level, *key):
+        stats = self.stats(level, *key)
+        return None if stats is None else self.rows.iloc[int(stats['latest'])]
+
+    # Rows of one key, oldest first
+    def rows_of(self, level, *key):
+        positions = self._positions[level].get(tuple(key), np.empty(0, dtype=np.int64))
+        return self.rows.iloc[positions]
+
+    def units(self, commodity):
+        units = self.tables['commodity_unit'].index
+        return sorted(units[units.get_level_values('Commodity_Name') == commodity].get_level_values('Unit').astype(str))
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from price_changes import SERIES_KEYS, month_number
+
+# Rolling statistics use this many months unless asked otherwise
+ROLLING_WINDOW = 6
+
+VOLATILITY_KEYS = ['Admin1_Name'] + SERIES_KEYS
+
+
+# Per (region, commodity, market, unit, price type) series and month the
+# engine keeps count, sum and sum of squares of each value column, plus the log
+# return of the monthly mean against the series' previous month. Prefix sums
+# over the series-major, month-sorted rows turn any month range of any series
+# into two lookups, so rolling windows cost O(n) in total and a filtered
+# summary costs O(series) instead of a scan over the raw rows.
+class VolatilityEngine:
+    def __init__(self, df, values=('Price', 'Standardized_Price')):
+        self.values = list(values)
+        parts = df[VOLATILITY_KEYS].assign(_month=month_number(df['Reference_Period_Start']))
+        aggregations = {}
+        for value in self.values:
+            column = df[value].astype('float64')
+            parts[f'{value}_sum'] = column
+            parts[f'{value}_sumsq'] = column * column
+            aggregations[f'{value}_count'] = (f'{value}_sum', 'count')
+            aggregations[f'{value}_sum'] = (f'{value}_sum', 'sum')
+            aggregations[f'{value}_sumsq'] = (f'{value}_sumsq', 'sum')
+        monthly = parts.groupby(VOLATILITY_KEYS + ['_month'], observed=True, sort=True).agg(**aggregations)
+
+        codes, uniques = pd.factorize(monthly.index.droplevel('_month'))
+        self.series = uniques.to_frame(index=False, name=VOLATILITY_KEYS)
+        self.codes = codes.astype(np.int64)
+        self.months = monthly.index.get_level_values('_month').to_numpy(np.int64)
+        self._stride = int(self.months.max()) + 1 if len(self.months) else 1
+        self._sorted_keys = self.codes * self._stride + self.months
+        self._prefix = {}
+        same_series = np.r_[False, self.codes[1:] == self.codes[:-1]]
+        for value in self.values:
+            count = monthly[f'{value}_count'].to_numpy('float64')
+            mean = monthly[f'{value}_sum'].to_numpy('float64') / count
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_return = np.log(mean[1:] / mean[:-1])
+            has_return = same_series & np.r_[False, np.isfinite(log_return)]
+            log_return = np.where(has_return, np.r_[0.0, log_return], 0.0)
+            stacked = np.column_stack([
+                count,
+                monthly[f'{value}_sum'].to_numpy('float64'),
+                monthly[f'{value}_sumsq'].to_numpy('float64'),
+                has_return.astype('float64'),
+                log_return,
+                log_return * log_return,
+            ])
+            self._prefix[value] = np.vstack([np.zeros((1, stacked.shape[1])), np.cumsum(stacked, axis=0)])
+        self._rolling = {}
+
+    def _range_sums(self, value, lo, hi):
+        prefix = self._prefix[value]
+        return prefix[hi] - prefix[lo]
+
+    # Rolling `window` month statistics for every series and month
+    def rolling(self, value='Price', window=ROLLING_WINDOW):
+        key = (value, window)
+        if key not in self._rolling:
+            lo = np.searchsorted(self._sorted_keys, self._sorted_keys - window + 1, 'left')
+            hi = np.arange(1, len(self._sorted_keys) + 1)
+            sums = self._range_sums(value, lo, hi)
+            # a window's first month has no return inside the window
+            sums[:, 3:] -= self._range_sums(value, lo, lo + 1)[:, 3:]
+            result = self.series.iloc[self.codes].reset_index(drop=True)
+            result['Month'] = pd.to_datetime({'year': self.months // 12, 'month': self.months % 12 + 1, 'day': 1})
+            self._rolling[key] = pd.concat([result, _moments(sums)], axis=1)
+        return self._rolling[key]
+
+    # Volatility of the raw rows falling in [start, end] for the selected
+    # series, grouped by any series column. count/mean/std/cv match a groupby
+    # over the filtered rows, return_vol is the std of the monthly log returns
+    # inside the range.
+    def summary(self, by='Commodity_Name', value='Price', start=None, end=None, **filters):
+        mask = np.ones(len(self.series), dtype=bool)
+        for col, wanted in filters.items():
+            if wanted is not None:
+                mask &= self.series[col].isin(list(wanted)).to_numpy()
+        codes = np.flatnonzero(mask)
+        first = 0 if start is None else int(month_number([start])[0])
+        last = self._stride - 1 if end is None else int(month_number([end])[0])
+        lo = np.searchsorted(self._sorted_keys, codes * self._stride + max(first, 0), 'left')
+        hi = np.searchsorted(self._sorted_keys, codes * self._stride + min(last, self._stride - 1), 'right')
+        hi = np.maximum(hi, lo)
+        sums = self._range_sums(value, lo, hi)
+        sums[:, 3:] -= self._range_sums(value, lo, np.minimum(lo + 1, hi))[:, 3:]
+        columns = ['count', 'sum', 'sumsq', 'return_count', 'return_sum', 'return_sumsq']
+        grouped = pd.DataFrame(sums, columns=columns).groupby(self.series[by].iloc[codes].to_numpy()).sum()
+        grouped = grouped[grouped['count'] > 0]
+        return _moments(grouped.to_numpy(), index=grouped.index.rename(by))
+
+
+def _std(count, total, sumsq):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (sumsq - total * total / count) / (count - 1)
+    return np.where(count > 1, np.sqrt(np.maximum(variance, 0)), np.nan)
+
+
+def _moments(sums, index=None):
+    count, total, sumsq, return_count, return_sum, return_sumsq = sums.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+    std = _std(count, total, sumsq)
+    return pd.DataFrame({
+        'count': count.astype(np.int64),
+        'mean': mean,
+        'std': std,
+        'cv': std / mean,
+        'return_vol': _std(return_count, return_sum, return_sumsq),
+    }, index=index)